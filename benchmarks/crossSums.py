@@ -0,0 +1,62 @@
+__author__ = "Tofu Gang"
+
+from itertools import combinations
+from tempfile import NamedTemporaryFile
+from timeit import repeat
+import os
+from benchmarks.generator import generatePuzzle
+from src.model import Model, crossSum
+
+
+
+################################################################################
+
+def _scanCheatSheet(length, clue):
+    """
+    The cheat sheet as it was computed before the table: all combinations of
+    the given length filtered by their sum.
+    """
+
+    return tuple(combination for combination
+                 in combinations([number for number in range(1, 10)], length)
+                 if sum(combination) == clue)
+
+################################################################################
+
+def main():
+    """
+    Compares looking up possible numbers of every word in a 30x30 puzzle the
+    old way (scanning combinations, twice per letter as the raw heuristic does)
+    with the precomputed cheat sheet, and times the raw heuristic itself.
+    """
+
+    with NamedTemporaryFile('w', suffix='.txt', delete=False) as f:
+        f.write(generatePuzzle(30, 30, seed=30))
+    try:
+        model = Model(f.name)
+    finally:
+        os.remove(f.name)
+    words = [(len(model.runs[index].indexes), model.runs[index].clue)
+             for letter in model._letters
+             for index in model._letterRuns(letter)]
+
+    def scan():
+        for length, clue in words:
+            set().union(*_scanCheatSheet(length, clue))
+
+    def table():
+        for length, clue in words:
+            crossSum(length, clue).possible
+
+    print('%d letters, %d words' % (len(model._letters), len(model.runs)))
+
+    for name, function in (('combinations scan', scan),
+                           ('cheat sheet table', table),
+                           ('rawHeuristic()', model.rawHeuristic)):
+        best = min(repeat(function, number=10, repeat=5)) / 10
+        print('%-20s %10.3f ms' % (name, best * 1000))
+
+################################################################################
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+__author__ = "Tofu Gang"
+
+from argparse import ArgumentParser
+import os
+import random
+
+
+
+################################################################################
+
+SIZES = (8, 15, 30, 50, 100, 200)
+DENSITIES = (0.2, 0.3, 0.45)
+
+################################################################################
+
+def generatePuzzle(width, height, density=0.3, seed=None, maxLength=9):
+    """
+    Generates a random Kakuro puzzle of given size in the text format read by
+    Model. Density is the probability of a square (other than the first row and
+    column, which are always clues) to be a filler or a clue instead of a
+    letter. Letters are filled row by row with random numbers not used yet in
+    their words; a letter which cannot get any number or would make its word
+    longer than maxLength letters is turned into a clue instead. Clues are then
+    summed up from the numbers, so the puzzle always has at least one solution,
+    though not necessarily a unique one. Long words make the puzzles much
+    harder for the search, since their clues say little about the letters.
+    """
+
+    rnd = random.Random(seed)
+    letters = [[i > 0 and j > 0 and rnd.random() >= density
+                for j in range(width)] for i in range(height)]
+    numbers = [[0] * width for i in range(height)]
+
+    for i in range(height):
+
+        for j in range(width):
+
+            if not letters[i][j]:
+                continue
+
+            used = set()
+            # go to the left in the row and up in the column until finding a
+            # clue, collecting numbers used in both words so far
+            k = j - 1
+            while letters[i][k]:
+                used.add(numbers[i][k])
+                k -= 1
+            l = i - 1
+            while letters[l][j]:
+                used.add(numbers[l][j])
+                l -= 1
+
+            free = [number for number in range(1, 10) if number not in used]
+            if j - k > maxLength or i - l > maxLength or len(free) == 0:
+                letters[i][j] = False
+            else:
+                numbers[i][j] = rnd.choice(free)
+
+    rows = []
+
+    for i in range(height):
+        tokens = []
+
+        for j in range(width):
+
+            if letters[i][j]:
+                tokens.append('L')
+                continue
+
+            horizontal = 0
+            k = j + 1
+            while k < width and letters[i][k]:
+                horizontal += numbers[i][k]
+                k += 1
+            vertical = 0
+            l = i + 1
+            while l < height and letters[l][j]:
+                vertical += numbers[l][j]
+                l += 1
+
+            if horizontal == 0 and vertical == 0:
+                tokens.append('E')
+            else:
+                tokens.append('V%s-H%s' % (vertical or '', horizontal or ''))
+        rows.append(';'.join(tokens))
+
+    return '\n'.join(rows) + '\n'
+
+################################################################################
+
+def puzzleName(width, height, density, seed):
+    """
+    Returns file name of a generated puzzle, telling how it was generated.
+    """
+
+    return '%dx%d_d%02d_s%d.txt' % (width, height, round(density * 100), seed)
+
+################################################################################
+
+def main(argv=None):
+    """
+    Writes a corpus of generated puzzles into a directory, one puzzle per file,
+    for every combination of the given sizes, densities and seeds.
+    """
+
+    parser = ArgumentParser(prog='python -m benchmarks.generator',
+                            description='Generate random Kakuro puzzles.')
+    parser.add_argument('directory', help='directory to write the puzzles to')
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES)
+    parser.add_argument('--densities', type=float, nargs='+',
+                        default=DENSITIES)
+    parser.add_argument('--seeds', type=int, default=1,
+                        help='number of puzzles of every size and density')
+    parser.add_argument('--max-length', type=int, default=9,
+                        help='the longest word allowed')
+    args = parser.parse_args(argv)
+
+    os.makedirs(args.directory, exist_ok=True)
+
+    for size in args.sizes:
+
+        for density in args.densities:
+
+            for seed in range(args.seeds):
+                fileName = os.path.join(args.directory,
+                                        puzzleName(size, size, density, seed))
+                with open(fileName, 'w') as f:
+                    f.write(generatePuzzle(size, size, density, seed,
+                                           args.max_length))
+
+################################################################################
+
+if __name__ == '__main__':
+    main()
+
+################################################################################
@@ -0,0 +1,131 @@
+__author__ = "Tofu Gang"
+
+from argparse import ArgumentParser
+import json
+import platform
+import statistics
+import subprocess
+import sys
+from benchmarks.run import _commit
+
+
+
+################################################################################
+
+# modules which must work without the GUI, each imported in a fresh
+# interpreter
+HEADLESS_MODULES = ('src.model', 'src.puzzleStream', 'src.instrumentation',
+                    'src.solutionCache', 'src.binaryCorpus',
+                    'src.parallelSearch', 'src.batch', 'src.service',
+                    'src.serviceClient', 'src.history')
+# packages none of the headless modules may import
+FORBIDDEN_PACKAGES = ('PyQt5', 'res', 'src.gui', 'numpy')
+# the longest import of the solver model allowed, in milliseconds
+MODEL_BUDGET = 50.0
+
+# run in the fresh interpreter: imports the module and prints the forbidden
+# packages it pulled in
+_PROBE = """
+import sys
+import %s
+print(' '.join(package for package in %r
+               if any(name == package or name.startswith(package + '.')
+                      for name in sys.modules)))
+"""
+
+################################################################################
+
+def importTime(module, repeat=5):
+    """
+    Imports the module in repeat fresh interpreters. Returns the median of
+    the cumulative import times (in milliseconds, as reported by python -X
+    importtime) and the forbidden packages it imported.
+    """
+
+    times = []
+
+    for i in range(repeat):
+        process = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c',
+             _PROBE % (module, FORBIDDEN_PACKAGES)],
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+            universal_newlines=True, check=True)
+
+        # lines are "import time: self [us] | cumulative | imported package",
+        # the package indented by its depth
+        for line in process.stderr.splitlines():
+            fields = line.split('|')
+            if len(fields) == 3 and fields[2].strip() == module:
+                times.append(int(fields[1]) / 1000)
+        forbidden = process.stdout.split()
+
+    return statistics.median(times), forbidden
+
+################################################################################
+
+def main(argv=None):
+    """
+    Measures import times of the headless modules and writes them as JSON.
+    Returns exit status 1 if any of them imports the GUI (or another
+    forbidden package) or the model takes longer than the budget, so the
+    split of the solver from the GUI is kept.
+    """
+
+    parser = ArgumentParser(prog='python -m benchmarks.importTime',
+                            description='Measure import times of the modules '
+                                        'which must work without the GUI.')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='fresh interpreters per module, the median is '
+                             'kept')
+    parser.add_argument('--budget', type=float, default=MODEL_BUDGET,
+                        metavar='MILLISECONDS',
+                        help='the longest import of src.model allowed '
+                             '(default: %g)' % MODEL_BUDGET)
+    parser.add_argument('-o', '--output', default='-',
+                        help='file to write the JSON results to')
+    args = parser.parse_args(argv)
+
+    results = {}
+    failures = []
+
+    for module in HEADLESS_MODULES:
+        milliseconds, forbidden = importTime(module, args.repeat)
+        results[module] = {'milliseconds': milliseconds,
+                           'forbidden': forbidden}
+        sys.stderr.write('%-22s %8.1f ms%s\n'
+                         % (module, milliseconds,
+                            '  imports ' + ' '.join(forbidden)
+                            if len(forbidden) > 0 else ''))
+        if len(forbidden) > 0:
+            failures.append('%s imports %s' % (module, ', '.join(forbidden)))
+
+    if results['src.model']['milliseconds'] > args.budget:
+        failures.append('src.model takes %.1f ms to import, budget is %g ms'
+                        % (results['src.model']['milliseconds'], args.budget))
+
+    report = {
+        'commit': _commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'budget': args.budget,
+        'results': results,
+        'failures': failures
+    }
+
+    if args.output == '-':
+        json.dump(report, sys.stdout, indent=1)
+        sys.stdout.write('\n')
+    else:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=1)
+
+    for failure in failures:
+        sys.stderr.write('FAILED: %s\n' % failure)
+    return 1 if len(failures) > 0 else 0
+
+################################################################################
+
+if __name__ == '__main__':
+    sys.exit(main())
+
+################################################################################
@@ -0,0 +1,131 @@
+__author__ = "Tofu Gang"
+
+from argparse import ArgumentParser
+from time import perf_counter
+import gc
+import json
+import platform
+import subprocess
+import sys
+import tracemalloc
+from benchmarks.generator import generatePuzzle
+from benchmarks.run import _commit
+from src.model import Model
+
+
+
+################################################################################
+
+# run in a fresh interpreter: loads the puzzle from the standard input count
+# times, keeping all the models, and prints the peak resident set size in
+# kilobytes before and after
+_PROBE = """
+import resource
+import sys
+from src.model import Model
+rows = sys.stdin.read().split()
+before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+models = [Model.fromLines(rows) for i in range(%d)]
+print(before, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+"""
+
+################################################################################
+
+def measureLoad(rows, repeat=5, count=10):
+    """
+    Measures loading of the puzzle given by its rows. Returns dictionary with
+    the best time of Model.fromLines() out of repeat, the bytes the loaded
+    model keeps allocated (so without the memory of the tables shared by all
+    the models), the same per square, and the growth of the resident set
+    size of a fresh interpreter loading count models of the puzzle.
+    """
+
+    result = {}
+    times = []
+
+    for i in range(repeat):
+        start = perf_counter()
+        Model.fromLines(rows)
+        times.append(perf_counter() - start)
+    result['loadSeconds'] = min(times)
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        model = Model.fromLines(rows)
+        gc.collect()
+        result['modelBytes'] = tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+    result['bytesPerSquare'] = result['modelBytes'] \
+        / (model.width * model.height)
+
+    process = subprocess.run([sys.executable, '-c', _PROBE % count],
+                             input='\n'.join(rows), stdout=subprocess.PIPE,
+                             universal_newlines=True, check=True)
+    before, after = (int(field) for field in process.stdout.split())
+    # ru_maxrss is in kilobytes on Linux, but in bytes on macOS
+    unit = 1 if sys.platform == 'darwin' else 1024
+    result['rssBytesPerModel'] = (after - before) * unit / count
+
+    return result
+
+################################################################################
+
+def main(argv=None):
+    """
+    Measures loading time and memory of models of generated puzzles and
+    writes the results as JSON.
+    """
+
+    parser = ArgumentParser(prog='python -m benchmarks.loadMemory',
+                            description='Measure loading time and memory of '
+                                        'puzzle models.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[50, 200],
+                        help='width and height of the generated puzzles')
+    parser.add_argument('--density', type=float, default=0.3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='loads of every puzzle, the best time is kept')
+    parser.add_argument('--count', type=int, default=10,
+                        help='models kept at once to measure the resident '
+                             'set size')
+    parser.add_argument('-o', '--output', default='-',
+                        help='file to write the JSON results to')
+    args = parser.parse_args(argv)
+
+    results = {}
+
+    for size in args.sizes:
+        rows = generatePuzzle(size, size, args.density, args.seed).split()
+        result = results['%dx%d' % (size, size)] \
+            = measureLoad(rows, args.repeat, args.count)
+        sys.stderr.write('%dx%d: load %.4f s, %d bytes (%.1f per square), '
+                         'RSS %d bytes per model\n'
+                         % (size, size, result['loadSeconds'],
+                            result['modelBytes'], result['bytesPerSquare'],
+                            result['rssBytesPerModel']))
+
+    report = {
+        'commit': _commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'density': args.density,
+        'seed': args.seed,
+        'results': results
+    }
+
+    if args.output == '-':
+        json.dump(report, sys.stdout, indent=1)
+        sys.stdout.write('\n')
+    else:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=1)
+
+################################################################################
+
+if __name__ == '__main__':
+    main()
+
+################################################################################
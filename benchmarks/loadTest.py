@@ -0,0 +1,197 @@
+__author__ = "Tofu Gang"
+
+from argparse import ArgumentParser
+from collections import Counter
+from time import perf_counter
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+from benchmarks.generator import generatePuzzle
+from benchmarks.run import _commit
+from src.serviceClient import ServiceClient
+
+
+
+################################################################################
+
+# how long to wait for a service started by the load test to listen
+START_SECONDS = 30
+
+################################################################################
+
+def percentile(values, fraction):
+    """
+    Returns the value below which the given fraction of the sorted values
+    lies (the nearest one, no interpolation).
+    """
+
+    if len(values) == 0:
+        return None
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+################################################################################
+
+async def _connect(path, port, wait=0):
+    """
+    Connects to the service on the Unix socket of the path, or on the TCP port
+    of the local host, trying again for wait seconds while it is starting.
+    """
+
+    deadline = perf_counter() + wait
+
+    while True:
+        try:
+            if path is None:
+                return await ServiceClient.connect(port=port)
+            return await ServiceClient.connect(path=path)
+        except OSError:
+            if perf_counter() > deadline:
+                raise
+            await asyncio.sleep(0.1)
+
+################################################################################
+
+async def loadTest(puzzles, clients, requests, path=None, port=None,
+                   search=False, timeout=None, wait=0):
+    """
+    Runs clients connections to the service at once, each of them sending
+    requests puzzles one after another (the next one as soon as the answer of
+    the previous one comes) taken round robin from the given rows of puzzles.
+    Returns dictionary with latencies (p50, p90, p99, max and mean, in
+    seconds), throughput (answers per second), counts of answer statuses and
+    statistics of the service after the test.
+    """
+
+    connections = [await _connect(path, port, wait) for i in range(clients)]
+    latencies = []
+    statuses = Counter()
+
+    async def run(client, first):
+
+        for k in range(requests):
+            rows = puzzles[(first + k) % len(puzzles)]
+            start = perf_counter()
+            result = await client.solve(rows, search=search, timeout=timeout)
+            latencies.append(perf_counter() - start)
+            statuses[result['status']] += 1
+
+    try:
+        start = perf_counter()
+        await asyncio.gather(*(run(client, k * requests)
+                               for k, client in enumerate(connections)))
+        seconds = perf_counter() - start
+        service = await connections[0].statistics()
+    finally:
+        for client in connections:
+            await client.close()
+
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'seconds': seconds,
+        'throughput': len(latencies) / seconds,
+        'p50': percentile(latencies, 0.5),
+        'p90': percentile(latencies, 0.9),
+        'p99': percentile(latencies, 0.99),
+        'max': latencies[-1],
+        'mean': sum(latencies) / len(latencies),
+        'statuses': dict(statuses),
+        'service': service
+    }
+
+################################################################################
+
+def main(argv=None):
+    """
+    Measures latency and throughput of the solver service on generated
+    puzzles and writes the results as JSON. Unless a running service is given,
+    one is started for the test on a Unix socket and stopped afterwards.
+    """
+
+    parser = ArgumentParser(prog='python -m benchmarks.loadTest',
+                            description='Load test of the solver service.')
+    parser.add_argument('--size', type=int, default=15)
+    parser.add_argument('--density', type=float, default=0.3)
+    parser.add_argument('--puzzles', type=int, default=20,
+                        help='number of different puzzles sent round robin')
+    parser.add_argument('--clients', type=int, default=8,
+                        help='connections sending requests at once')
+    parser.add_argument('--requests', type=int, default=50,
+                        help='requests sent by every client, one after another')
+    parser.add_argument('-s', '--search', action='store_true',
+                        help='let the service search when the heuristics '
+                             'stall')
+    parser.add_argument('--timeout', type=float, default=10.0,
+                        metavar='SECONDS',
+                        help='time limit of every request (default: 10)')
+    parser.add_argument('-w', '--workers', type=int, default=os.cpu_count() or 1,
+                        help='worker processes of the started service '
+                             '(default: CPU count)')
+    parser.add_argument('-p', '--port', type=int,
+                        help='TCP port of a running service to test')
+    parser.add_argument('-u', '--unix', metavar='PATH',
+                        help='Unix socket of a running service to test')
+    parser.add_argument('-o', '--output', default='-',
+                        help='file to write the JSON results to')
+    args = parser.parse_args(argv)
+
+    puzzles = [generatePuzzle(args.size, args.size, args.density, seed)
+               .split() for seed in range(args.puzzles)]
+    service = None
+    directory = None
+    path = args.unix
+    wait = 0
+
+    if args.port is None and args.unix is None:
+        directory = tempfile.TemporaryDirectory()
+        path = os.path.join(directory.name, 'service.socket')
+        service = subprocess.Popen([sys.executable, '-m', 'src.service',
+                                    '--unix', path,
+                                    '--workers', str(args.workers)])
+        wait = START_SECONDS
+
+    try:
+        results = asyncio.run(loadTest(puzzles, args.clients, args.requests,
+                                       path, args.port, args.search,
+                                       args.timeout, wait))
+    finally:
+        if service is not None:
+            service.terminate()
+            service.wait()
+            directory.cleanup()
+
+    sys.stderr.write('%d requests in %.2f s: %.1f per second, p50 %.4f s, '
+                     'p99 %.4f s\n'
+                     % (results['requests'], results['seconds'],
+                        results['throughput'], results['p50'],
+                        results['p99']))
+    report = {
+        'commit': _commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'size': args.size,
+        'density': args.density,
+        'puzzles': args.puzzles,
+        'clients': args.clients,
+        'search': args.search,
+        'timeout': args.timeout,
+        'results': results
+    }
+
+    if args.output == '-':
+        json.dump(report, sys.stdout, indent=1)
+        sys.stdout.write('\n')
+    else:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=1)
+
+################################################################################
+
+if __name__ == '__main__':
+    main()
+
+################################################################################
@@ -0,0 +1,247 @@
+__author__ = "Tofu Gang"
+
+from argparse import ArgumentParser
+from time import perf_counter
+import json
+import platform
+import subprocess
+import sys
+import tracemalloc
+from benchmarks.generator import generatePuzzle, SIZES, DENSITIES
+from src.model import Model, clearSupportCache, supportCacheStatistics
+
+
+
+################################################################################
+
+# measurements compared between two result files
+METRICS = ('loadSeconds', 'rawHeuristicSeconds', 'roundsSeconds',
+           'solveSeconds', 'searchNodes', 'peakBytes')
+
+################################################################################
+
+def _commit():
+    """
+    Returns hash of the checked out commit, or None outside of a git tree.
+    """
+
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'],
+                                       stderr=subprocess.DEVNULL,
+                                       universal_newlines=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+################################################################################
+
+def _timed(function):
+    """
+    Calls the function and returns its result and the time it took.
+    """
+
+    start = perf_counter()
+    result = function()
+    return result, perf_counter() - start
+
+################################################################################
+
+def _model(rows, rules=None):
+    """
+    Returns model of the puzzle propagating the given rules (the default ones
+    if None).
+    """
+
+    model = Model.fromLines(rows)
+    if rules is not None:
+        model.rules = [rule for rule in Model.RULE_ORDER if rule in rules]
+    return model
+
+################################################################################
+
+def benchmarkPuzzle(rows, search=False, rules=None):
+    """
+    Measures one puzzle given by its rows. Returns dictionary with time spent
+    in Model.__init__ (loading), rawHeuristic(), every round of the two
+    context heuristics applied one after another (as the GUI steps do) and the
+    whole solve() on a fresh model, with peak memory allocated while loading
+    and solving and with calls, excluded numbers and time of every rule given
+    to propagate (measured on another solve(), with the instrumentation).
+    The word support cache is cleared before every measurement, so that
+    puzzles (and repeats) measured earlier do not make it faster; its hit
+    rate during the solve() is kept too.
+    """
+
+    result = {}
+    model, result['loadSeconds'] = _timed(lambda: Model.fromLines(rows))
+    result['letters'] = len(model._letters)
+    result['words'] = len(model.runs)
+    clearSupportCache()
+    _, result['rawHeuristicSeconds'] = _timed(model.rawHeuristic)
+
+    rounds = []
+    while True:
+        changed, seconds = _timed(
+            lambda: model.contextSolutionsHeuristic()
+                    | model.generalizedRepetitionHeuristic())
+        rounds.append(seconds)
+        if not changed:
+            break
+    result['roundSeconds'] = rounds
+    result['roundsSeconds'] = sum(rounds)
+
+    model = _model(rows, rules)
+    clearSupportCache()
+    _, result['solveSeconds'] = _timed(lambda: model.solve(search=search))
+    result['solved'] = model.isSolved()
+    result['searchNodes'] = model.searchNodes
+    result['supportHitRate'] = supportCacheStatistics()['hitRate']
+
+    model = _model(rows, rules)
+    model.enableInstrumentation()
+    model.solve(search=search)
+    result['rules'] = model.statistics()['rules']
+
+    clearSupportCache()
+    tracemalloc.start()
+    try:
+        _model(rows, rules).solve(search=search)
+        result['peakBytes'] = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return result
+
+################################################################################
+
+def runBenchmarks(sizes, densities, seeds, repeat=1, search=False,
+                  maxLength=9, rules=None, log=None):
+    """
+    Benchmarks generated puzzles of all combinations of the given sizes,
+    densities and seeds. Every puzzle is measured repeat times and the best
+    times are kept. Returns list of results, one per puzzle.
+    """
+
+    results = []
+
+    for size in sizes:
+
+        for density in densities:
+
+            for seed in range(seeds):
+                rows = generatePuzzle(size, size, density, seed,
+                                      maxLength).split()
+                runs = [benchmarkPuzzle(rows, search, rules)
+                        for i in range(repeat)]
+                result = {'size': size, 'density': density, 'seed': seed,
+                          'maxLength': maxLength}
+                result.update(runs[0])
+
+                for key in result:
+                    if key.endswith('Seconds') and key != 'roundSeconds':
+                        result[key] = min(run[key] for run in runs)
+
+                results.append(result)
+                if log is not None:
+                    log.write('%dx%d density %.2f seed %d: solve %.3f s, '
+                              '%d search nodes\n'
+                              % (size, size, density, seed,
+                                 result['solveSeconds'],
+                                 result['searchNodes']))
+                    log.flush()
+
+    return results
+
+################################################################################
+
+def compare(baseFileName, newFileName, out=sys.stdout):
+    """
+    Prints ratios of new to base measurements for every puzzle present in both
+    result files, so regressions between two commits stand out (ratio above
+    1 means slower or bigger).
+    """
+
+    with open(baseFileName) as f:
+        base = json.load(f)
+    with open(newFileName) as f:
+        new = json.load(f)
+
+    key = lambda result: (result['size'], result['density'], result['seed'])
+    baseResults = {key(result): result for result in base['results']}
+    out.write('%-22s' % 'puzzle' + ''.join('%14s' % metric[:13]
+                                           for metric in METRICS) + '\n')
+
+    for result in new['results']:
+        old = baseResults.get(key(result))
+        if old is None:
+            continue
+
+        out.write('%-22s' % ('%dx%d d%.2f s%d'
+                             % (result['size'], result['size'],
+                                result['density'], result['seed'])))
+
+        for metric in METRICS:
+            if old.get(metric):
+                out.write('%14.2f' % (result[metric] / old[metric]))
+            else:
+                out.write('%14s' % '-')
+        out.write('\n')
+
+################################################################################
+
+def main(argv=None):
+    """
+    Runs the benchmarks and writes the results as JSON, or compares two
+    result files written before.
+    """
+
+    parser = ArgumentParser(prog='python -m benchmarks.run',
+                            description='Benchmark the solver on generated '
+                                        'puzzles.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES)
+    parser.add_argument('--densities', type=float, nargs='+',
+                        default=DENSITIES)
+    parser.add_argument('--seeds', type=int, default=1,
+                        help='number of puzzles of every size and density')
+    parser.add_argument('--max-length', type=int, default=9,
+                        help='the longest word of generated puzzles')
+    parser.add_argument('--repeat', type=int, default=1,
+                        help='measure every puzzle this many times, keep the '
+                             'best')
+    parser.add_argument('--search', action='store_true',
+                        help='let solve() search when the heuristics stall')
+    parser.add_argument('--rules', nargs='+', choices=Model.RULE_ORDER,
+                        help='rules to propagate instead of the default ones')
+    parser.add_argument('-o', '--output', default='-',
+                        help='file to write the JSON results to')
+    parser.add_argument('--compare', nargs=2, metavar=('BASE', 'NEW'),
+                        help='compare two result files instead of running')
+    args = parser.parse_args(argv)
+
+    if args.compare is not None:
+        compare(*args.compare)
+        return
+
+    results = runBenchmarks(args.sizes, args.densities, args.seeds,
+                            args.repeat, args.search, args.max_length,
+                            args.rules, log=sys.stderr)
+    report = {
+        'commit': _commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'rules': args.rules or Model().rules,
+        'results': results
+    }
+
+    if args.output == '-':
+        json.dump(report, sys.stdout, indent=1)
+        sys.stdout.write('\n')
+    else:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=1)
+
+################################################################################
+
+if __name__ == '__main__':
+    main()
+
+################################################################################
@@ -2,7 +2,7 @@ __author__ = "Tofu Gang"
 
 from PyQt5.QtWidgets import QApplication
 from PyQt5.QtCore import QCoreApplication
-from src.mainWindow import MainWindow
+from src.gui.mainWindow import MainWindow
 import sys
 
 
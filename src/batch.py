@@ -0,0 +1,337 @@
+__author__ = "Tofu Gang"
+
+from argparse import ArgumentParser
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from glob import glob
+from itertools import islice
+from time import perf_counter
+import json
+import os
+import sys
+from src.binaryCorpus import Corpus, isCorpusFile
+from src.instrumentation import profileCall
+from src.model import Model
+from src.puzzleStream import fileFormat, openPuzzleFile, readRecords, \
+    PuzzleWriter
+from src.solutionCache import SolutionCache
+
+
+
+################################################################################
+
+# solution caches of this process by their file names, opened on first use
+_solutionCaches = {}
+# binary corpora mapped by this process by their file names
+_corpora = {}
+
+
+
+################################################################################
+
+def puzzleFiles(paths):
+    """
+    Returns sorted list of puzzle files from the given paths. A path can be a
+    puzzle file, a directory (all files in it are taken) or a glob pattern.
+    """
+
+    files = []
+
+    for path in paths:
+
+        if os.path.isdir(path):
+            files.extend(sorted(os.path.join(path, name)
+                                for name in os.listdir(path)
+                                if os.path.isfile(os.path.join(path, name))))
+        elif os.path.isfile(path):
+            files.append(path)
+        else:
+            files.extend(sorted(name for name in glob(path)
+                                if os.path.isfile(name)))
+
+    return files
+
+################################################################################
+
+def puzzleRecords(files):
+    """
+    Generates all puzzles from the given files one by one, each as a
+    dictionary with the file, number of the puzzle in the file, its name and
+    its rows. Puzzles of a binary corpus have no rows, workers map the corpus
+    and read them from it. A file which cannot be read gives a record with
+    the error instead of the rows.
+    """
+
+    for fileName in files:
+        number = 0
+
+        try:
+            if isCorpusFile(fileName):
+                corpus = openCorpus(fileName)
+
+                for number in range(len(corpus)):
+                    yield {'file': fileName, 'index': number,
+                           'name': corpus.name(number)}
+                continue
+
+            with openPuzzleFile(fileName) as f:
+
+                for name, rows in readRecords(f, fileFormat(fileName)):
+                    yield {'file': fileName, 'index': number, 'name': name,
+                           'rows': rows}
+                    number += 1
+        except (OSError, ValueError) as e:
+            yield {'file': fileName, 'index': number, 'name': None,
+                   'error': '%s: %s' % (type(e).__name__, e)}
+
+################################################################################
+
+def _profileName(directory, record):
+    """
+    Returns name of the file in the directory to write the profile of solving
+    the record to.
+    """
+
+    name = os.path.basename(record['file'])
+    return os.path.join(directory, '%s.%d.prof' % (name, record['index']))
+
+################################################################################
+
+def openCorpus(fileName):
+    """
+    Returns the binary corpus mapped by this process, mapping it on the first
+    call. All the processes share the pages of the file.
+    """
+
+    corpus = _corpora.get(fileName)
+    if corpus is None:
+        corpus = _corpora[fileName] = Corpus(fileName)
+    return corpus
+
+################################################################################
+
+def _solutionCache(fileName):
+    """
+    Returns solution cache of this process stored in the file, opening it on
+    the first call.
+    """
+
+    cache = _solutionCaches.get(fileName)
+    if cache is None:
+        cache = _solutionCaches[fileName] = SolutionCache(fileName)
+    return cache
+
+################################################################################
+
+def solveRecord(record, search=False, stats=False, profile=None, cache=None,
+                countLimit=None, rules=None, timeout=None):
+    """
+    Loads and solves one puzzle record. Returns dictionary with the result which
+    can be written as one JSON line: where the puzzle comes from, status
+    (solved, unsolved or error), the puzzle with solved letters filled in and
+    the time spent loading and solving it. With stats, counters of the rules,
+    rounds and search are added to the result. With profile (a directory),
+    solving is run under cProfile and the profile is written there. With
+    cache (file name of a solution cache), puzzles solved before are taken
+    from the cache and the result tells whether it was. With countLimit,
+    solutions are counted up to that limit instead (the cache is not used)
+    and the count is added to the result, so 1 tells the solution is unique.
+    rules, if given, are names of the rules to propagate instead of the
+    default ones. With timeout (in seconds), solving is stopped when it takes
+    longer than that and the status is timeout.
+    """
+
+    result = {'file': record['file'], 'index': record['index'],
+              'name': record['name']}
+
+    if 'error' in record:
+        result['status'] = 'error'
+        result['error'] = record['error']
+        return result
+
+    try:
+        start = perf_counter()
+        if 'rows' in record:
+            model = Model.fromLines(record['rows'])
+        else:
+            model = openCorpus(record['file']).model(record['index'])
+        if rules is not None:
+            model.rules = [rule for rule in Model.RULE_ORDER if rule in rules]
+        if stats:
+            model.enableInstrumentation()
+        loaded = perf_counter()
+        if countLimit is not None:
+            solve = partial(model.countSolutions, countLimit, timeout=timeout)
+        elif cache is None:
+            solve = partial(model.solve, search=search, timeout=timeout)
+        else:
+            # it returns whether the solution was found in the cache
+            solve = partial(_solutionCache(cache).solve, model, search=search,
+                            timeout=timeout)
+        if profile is None:
+            outcome = solve()
+        else:
+            outcomes = []
+            profileCall(lambda: outcomes.append(solve()),
+                        _profileName(profile, record))
+            outcome = outcomes[0]
+        solved = perf_counter()
+    except Exception as e:
+        result['status'] = 'error'
+        result['error'] = '%s: %s' % (type(e).__name__, e)
+        return result
+
+    # solve() tells how it ended by its result, the count and the cache
+    # return something else, so the model is asked instead
+    if countLimit is None and cache is None:
+        stopStatus = outcome.status
+    else:
+        stopStatus = model.stopStatus
+    if stopStatus == Model.EXHAUSTED:
+        result['status'] = 'timeout'
+    else:
+        result['status'] = 'solved' if model.isSolved() else 'unsolved'
+    result['solution'] = model.toText().split()
+    result['loadSeconds'] = loaded - start
+    result['solveSeconds'] = solved - loaded
+    if countLimit is not None:
+        result['solutions'] = outcome
+    elif cache is not None:
+        result['cached'] = outcome
+    if stats:
+        result['stats'] = model.statistics()
+    return result
+
+################################################################################
+
+def _solveChunk(solve, chunk):
+    """
+    Solves a chunk of puzzle records in a worker process.
+    """
+
+    return [solve(record) for record in chunk]
+
+################################################################################
+
+def solveAll(executor, solve, records, chunkSize, window):
+    """
+    Generates results of solving all the records in the executor, in the order
+    of the records. Records are read only as they are needed: at most window
+    chunks are waiting in the executor at a time, so memory does not grow with
+    the number of puzzles.
+    """
+
+    records = iter(records)
+    pending = deque()
+
+    while True:
+        chunk = list(islice(records, chunkSize))
+
+        if len(chunk) > 0:
+            pending.append(executor.submit(_solveChunk, solve, chunk))
+
+        if len(pending) > 0 and (len(chunk) == 0 or len(pending) >= window):
+            yield from pending.popleft().result()
+        elif len(chunk) == 0:
+            return
+
+################################################################################
+
+def main(argv=None):
+    """
+    Solves puzzles from the files given on the command line in a pool of
+    processes and writes one JSON line per puzzle, in the order of the files.
+    Returns exit status: 0 if all the puzzles were solved, 1 otherwise.
+    """
+
+    parser = ArgumentParser(prog='python -m src.batch',
+                            description='Solve Kakuro puzzle files without GUI.')
+    parser.add_argument('paths', nargs='+',
+                        help='puzzle files (text, .jsonl, optionally .gz, '
+                             'or binary .kkc corpora), directories or glob '
+                             'patterns')
+    parser.add_argument('-w', '--workers', type=int, default=os.cpu_count() or 1,
+                        help='number of worker processes (default: CPU count)')
+    parser.add_argument('-c', '--chunk-size', type=int, default=1,
+                        help='puzzles handed to a worker at once (default: 1)')
+    parser.add_argument('-s', '--search', action='store_true',
+                        help='search by trial and error when the heuristics '
+                             'are not enough')
+    parser.add_argument('-o', '--output', default='-',
+                        help='file to write the results to (default: stdout)')
+    parser.add_argument('--solutions',
+                        help='file to stream the solved puzzles to (text or '
+                             '.jsonl, optionally .gz)')
+    parser.add_argument('--stats', action='store_true',
+                        help='add counters of the rules, rounds and search to '
+                             'the results')
+    parser.add_argument('--profile', metavar='DIRECTORY',
+                        help='write a cProfile profile of every puzzle to the '
+                             'directory')
+    parser.add_argument('--cache', metavar='FILE',
+                        help='take puzzles solved before from the solution '
+                             'cache in the file and store new solutions there')
+    parser.add_argument('--count-solutions', type=int, metavar='LIMIT',
+                        help='count solutions of every puzzle up to the limit '
+                             '(2 checks uniqueness) instead of solving it')
+    parser.add_argument('--rules', nargs='+', choices=Model.RULE_ORDER,
+                        help='rules to propagate (default: %s)'
+                             % ' '.join(Model().rules))
+    parser.add_argument('--timeout', type=float, metavar='SECONDS',
+                        help='give up puzzles taking longer than that '
+                             '(status timeout)')
+    args = parser.parse_args(argv)
+
+    if args.profile is not None:
+        os.makedirs(args.profile, exist_ok=True)
+    records = puzzleRecords(puzzleFiles(args.paths))
+    solve = partial(solveRecord, search=args.search, stats=args.stats,
+                    profile=args.profile, cache=args.cache,
+                    countLimit=args.count_solutions, rules=args.rules,
+                    timeout=args.timeout)
+    output = sys.stdout if args.output == '-' else open(args.output, 'w')
+    solutions = None
+    allSolved = True
+    cacheHits = 0
+    cacheMisses = 0
+
+    try:
+        if args.solutions is not None:
+            solutions = PuzzleWriter(openPuzzleFile(args.solutions, 'w'),
+                                     fileFormat(args.solutions))
+
+        with ProcessPoolExecutor(max_workers=args.workers) as executor:
+
+            for result in solveAll(executor, solve, records, args.chunk_size,
+                                   2 * args.workers):
+                allSolved = allSolved and result['status'] == 'solved'
+                if result.get('cached') == True:
+                    cacheHits += 1
+                elif result.get('cached') == False:
+                    cacheMisses += 1
+                output.write(json.dumps(result) + '\n')
+                output.flush()
+
+                if solutions is not None and 'solution' in result:
+                    name = result['name']
+                    if name is None:
+                        name = '%s:%d' % (result['file'], result['index'])
+                    solutions.writeRows(result['solution'], name,
+                                        status=result['status'])
+    finally:
+        if output is not sys.stdout:
+            output.close()
+        if solutions is not None:
+            solutions.f.close()
+
+    if args.cache is not None:
+        sys.stderr.write('solution cache: %d hits, %d misses\n'
+                         % (cacheHits, cacheMisses))
+
+    return 0 if allSolved else 1
+
+################################################################################
+
+if __name__ == '__main__':
+    sys.exit(main())
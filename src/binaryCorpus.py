@@ -0,0 +1,370 @@
+__author__ = "Tofu Gang"
+
+from argparse import ArgumentParser
+from array import array
+import mmap
+import struct
+import sys
+from src.model import Model, NUMBER_BITS
+from src.puzzleStream import fileFormat, openPuzzleFile, readRecords, \
+    PuzzleWriter
+
+
+
+################################################################################
+
+# A corpus file holds many puzzles in binary form:
+# - header: MAGIC, VERSION, number of puzzles and offset of the index
+# - puzzles, each of them a PUZZLE_HEADER (width, height, length of the name),
+#   the name in UTF-8 padded to an even length and then one 16-bit square code
+#   per square, row by row
+# - index: offset of every puzzle as an unsigned 64-bit number
+# All numbers are little endian. A square code is FILLER, LETTER_CODE with the
+# given number (if any) in the lowest bits, or CLUE_CODE with the vertical
+# clue shifted by CLUE_BITS and the horizontal clue in the lowest bits (0 for
+# no clue).
+MAGIC = b'KKRC'
+VERSION = 1
+CORPUS_SUFFIX = '.kkc'
+HEADER = struct.Struct('<4sHxxQQ')
+PUZZLE_HEADER = struct.Struct('<HHH')
+INDEX_ENTRY = struct.Struct('<Q')
+FILLER = 0
+LETTER_CODE = 0x4000
+CLUE_CODE = 0x8000
+CLUE_BITS = 6
+CLUE_MASK = (1 << CLUE_BITS) - 1
+
+################################################################################
+
+def isCorpusFile(fileName):
+    """
+    Returns True if the file name is of a binary corpus.
+    """
+
+    return fileName.endswith(CORPUS_SUFFIX)
+
+################################################################################
+
+def _cast(view, typecode):
+    """
+    Returns the bytes as unsigned numbers of the type given by typecode ('H'
+    or 'Q'). On little endian machines it is a view of the same memory with
+    nothing copied; elsewhere the numbers must be copied and byte swapped.
+    """
+
+    if sys.byteorder == 'little':
+        return view.cast(typecode)
+
+    numbers = array(typecode, bytes(view))
+    numbers.byteswap()
+    return numbers
+
+################################################################################
+
+def _release(numbers):
+    """
+    Releases numbers returned by _cast(), so the file can be unmapped.
+    """
+
+    if isinstance(numbers, memoryview):
+        numbers.release()
+
+################################################################################
+
+def _squareCode(model, i, j):
+    """
+    Returns code of the square in the i-th row and j-th column of the model.
+    Solved letters are written as given.
+    """
+
+    kind = model.kind(i, j)
+
+    if kind == model.FILLER_SQUARE:
+        return FILLER
+    elif kind == model.LETTER_SQUARE:
+        candidates = model.candidates(i, j)
+        return LETTER_CODE | (candidates[0] if len(candidates) == 1 else 0)
+    else:
+        horizontal, vertical = model.clues(i, j)
+        horizontal = horizontal or 0
+        vertical = vertical or 0
+        if horizontal > CLUE_MASK or vertical > CLUE_MASK:
+            raise ValueError('clue out of range in square (%d, %d)' % (i, j))
+        return CLUE_CODE | (vertical << CLUE_BITS) | horizontal
+
+################################################################################
+
+def encodePuzzle(model, name=None):
+    """
+    Returns the model encoded as one puzzle of a corpus.
+    """
+
+    name = b'' if name is None else name.encode('utf-8')
+    codes = struct.pack('<%dH' % (model.width * model.height),
+                        *(_squareCode(model, i, j)
+                          for i in range(model.height)
+                          for j in range(model.width)))
+    return PUZZLE_HEADER.pack(model.width, model.height, len(name)) + name \
+        + b'\0' * (len(name) % 2) + codes
+
+################################################################################
+
+def _arrays(codes, width, height):
+    """
+    Returns the arguments of Model.fromArrays() decoded from the square codes:
+    width, height, kinds of squares, horizontal and vertical clues and masks
+    of given letters.
+    """
+
+    size = width * height
+    kinds = bytearray(size)
+    horizontalClues = array('H', bytes(2 * size))
+    verticalClues = array('H', bytes(2 * size))
+    given = {}
+
+    for index, code in enumerate(codes[:size]):
+        if code & CLUE_CODE:
+            kinds[index] = Model.CLUE_SQUARE
+            horizontalClues[index] = code & CLUE_MASK
+            verticalClues[index] = (code >> CLUE_BITS) & CLUE_MASK
+        elif code & LETTER_CODE:
+            kinds[index] = Model.LETTER_SQUARE
+            if code & 0xF:
+                given[index] = NUMBER_BITS[(code & 0xF) - 1]
+
+    return width, height, kinds, horizontalClues, verticalClues, given
+
+################################################################################
+
+class CorpusWriter(object):
+
+################################################################################
+
+    def __init__(self, f):
+        """
+        Creates a writer of puzzles into the binary file open for writing. The
+        index is written by close().
+        """
+
+        self.f = f
+        self._offsets = []
+        self.f.write(HEADER.pack(MAGIC, VERSION, 0, 0))
+
+################################################################################
+
+    def write(self, model, name=None):
+        """
+        Writes the puzzle of the model, solved letters written as given.
+        """
+
+        self._offsets.append(self.f.tell())
+        self.f.write(encodePuzzle(model, name))
+
+################################################################################
+
+    def writeRows(self, rows, name=None):
+        """
+        Writes one puzzle given by rows of the text format.
+        """
+
+        self.write(Model.fromLines(rows), name)
+
+################################################################################
+
+    def __len__(self):
+        return len(self._offsets)
+
+################################################################################
+
+    def close(self):
+        """
+        Writes the index, fills in the header and closes the file.
+        """
+
+        indexOffset = self.f.tell()
+        self.f.write(b''.join(INDEX_ENTRY.pack(offset)
+                              for offset in self._offsets))
+        self.f.seek(0)
+        self.f.write(HEADER.pack(MAGIC, VERSION, len(self._offsets),
+                                 indexOffset))
+        self.f.close()
+
+################################################################################
+
+    def __enter__(self):
+        return self
+
+################################################################################
+
+    def __exit__(self, *exception):
+        self.close()
+
+################################################################################
+
+class Corpus(object):
+
+################################################################################
+
+    def __init__(self, fileName):
+        """
+        Opens the binary corpus memory-mapped. Nothing is read until a puzzle
+        is asked for, and then only its bytes; processes opening the same file
+        share its pages in memory instead of each having a copy.
+        """
+
+        self.fileName = fileName
+        with open(fileName, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._buffer = memoryview(self._mmap)
+
+        if len(self._buffer) < HEADER.size:
+            self.close()
+            raise ValueError('%s: not a puzzle corpus' % fileName)
+        magic, version, count, indexOffset = HEADER.unpack_from(self._buffer)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError('%s: not a puzzle corpus of version %d'
+                             % (fileName, VERSION))
+
+        self._offsets = _cast(self._buffer[indexOffset:indexOffset
+                                           + count * INDEX_ENTRY.size], 'Q')
+
+################################################################################
+
+    def __len__(self):
+        return len(self._offsets)
+
+################################################################################
+
+    def _header(self, number):
+        """
+        Returns width, height, name and offset of square codes of the puzzle
+        with the given number.
+        """
+
+        offset = self._offsets[number]
+        width, height, nameLength = PUZZLE_HEADER.unpack_from(self._buffer,
+                                                              offset)
+        offset += PUZZLE_HEADER.size
+        name = bytes(self._buffer[offset:offset + nameLength]).decode('utf-8')
+        offset += nameLength + nameLength % 2
+        return width, height, name or None, offset
+
+################################################################################
+
+    def name(self, number):
+        """
+        Returns name of the puzzle with the given number, None if it has none.
+        """
+
+        return self._header(number)[2]
+
+################################################################################
+
+    def model(self, number):
+        """
+        Returns model of the puzzle with the given number, built right from the
+        square codes in the mapped file.
+        """
+
+        width, height, name, offset = self._header(number)
+        codes = _cast(self._buffer[offset:offset + 2 * width * height], 'H')
+        try:
+            return Model.fromArrays(*_arrays(codes, width, height))
+        finally:
+            _release(codes)
+
+################################################################################
+
+    def __iter__(self):
+        """
+        Generates all the puzzles as tuples of their name and model.
+        """
+
+        for number in range(len(self)):
+            yield self.name(number), self.model(number)
+
+################################################################################
+
+    def close(self):
+        """
+        Unmaps the file.
+        """
+
+        if hasattr(self, '_offsets'):
+            _release(self._offsets)
+        self._buffer.release()
+        self._mmap.close()
+
+################################################################################
+
+    def __enter__(self):
+        return self
+
+################################################################################
+
+    def __exit__(self, *exception):
+        self.close()
+
+################################################################################
+
+def textToBinary(textFileName, corpusFileName):
+    """
+    Converts puzzles from a text or JSON Lines file (optionally compressed)
+    into a binary corpus. Returns the number of puzzles.
+    """
+
+    with openPuzzleFile(textFileName) as f, \
+            CorpusWriter(open(corpusFileName, 'wb')) as writer:
+
+        for name, rows in readRecords(f, fileFormat(textFileName)):
+            writer.writeRows(rows, name)
+
+        return len(writer)
+
+################################################################################
+
+def binaryToText(corpusFileName, textFileName):
+    """
+    Converts a binary corpus into a text or JSON Lines file (optionally
+    compressed). Returns the number of puzzles.
+    """
+
+    with Corpus(corpusFileName) as corpus, \
+            openPuzzleFile(textFileName, 'w') as f:
+        writer = PuzzleWriter(f, fileFormat(textFileName))
+
+        for name, model in corpus:
+            writer.write(model, name)
+
+        return len(corpus)
+
+################################################################################
+
+def main(argv=None):
+    """
+    Converts puzzle files between the text formats and the binary corpus,
+    in the direction given by the suffix of the output file.
+    """
+
+    parser = ArgumentParser(prog='python -m src.binaryCorpus',
+                            description='Convert puzzles to or from a binary '
+                                        'corpus (%s).' % CORPUS_SUFFIX)
+    parser.add_argument('input', help='puzzle file to convert')
+    parser.add_argument('output', help='file to write, a binary corpus if it '
+                                       'ends with %s' % CORPUS_SUFFIX)
+    args = parser.parse_args(argv)
+
+    if isCorpusFile(args.output):
+        count = textToBinary(args.input, args.output)
+    else:
+        count = binaryToText(args.input, args.output)
+    sys.stderr.write('%d puzzles converted\n' % count)
+
+################################################################################
+
+if __name__ == '__main__':
+    main()
+
+################################################################################
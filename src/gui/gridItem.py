@@ -0,0 +1,230 @@
+__author__ = "Tofu Gang"
+
+from math import floor, ceil
+from PyQt5.QtCore import Qt, QRectF, QLineF
+from PyQt5.QtWidgets import QGraphicsItem, QStyleOptionGraphicsItem
+from PyQt5.QtGui import QPen, QBrush, QColor, QFont, QImage
+from src.model import NUMBERS, POPCOUNT
+
+
+
+################################################################################
+
+class GridItem(QGraphicsItem):
+    PEN = QPen(Qt.black, 0, Qt.SolidLine)
+    FILLER_BRUSH = QBrush(Qt.gray, Qt.SolidPattern)
+    # below this many pixels per square, squares are only colored: gray for
+    # fillers and clues, white for unsolved letters, green for solved ones and
+    # red for letters with no possible numbers
+    DETAIL_PIXELS = 20
+    FILLER_COLOR = 0
+    UNSOLVED_COLOR = 1
+    SOLVED_COLOR = 2
+    FAILED_COLOR = 3
+    COLOR_TABLE = [QColor(Qt.gray).rgb(), QColor(Qt.white).rgb(),
+                   QColor(170, 230, 170).rgb(), QColor(Qt.red).rgb()]
+    # with more changed letters than this, the whole item is repainted at once
+    UPDATE_ALL_CHANGES = 256
+
+################################################################################
+
+    def __init__(self, model, size, parent=None):
+        """
+        The whole puzzle as one item. Only squares in the exposed (visible)
+        part of the view are painted, so painting time depends on the size of
+        the view, not of the puzzle. Zoomed out, squares are painted as one
+        scaled image with a pixel per square instead of numbers. The item keeps
+        its own copy of possible numbers, updated by updateLetters(), so it
+        can be painted while the model is being solved in another thread.
+        """
+
+        super(GridItem, self).__init__(parent)
+        self.setFlag(QGraphicsItem.ItemUsesExtendedStyleOption)
+        self.model = model
+        self.size = size
+        self.masks = model.snapshot()
+        self._rect = QRectF(0, 0, model.width * size, model.height * size)
+        self._bigFont = QFont()
+        self._bigFont.setPixelSize(size // 2)
+        self._smallFont = QFont()
+        self._smallFont.setPixelSize(size // 4)
+
+        # color of every square for the overview, a byte per square; rows are
+        # padded to 4 bytes as QImage wants them
+        self._stride = (model.width + 3) & ~3
+        self._colors = bytearray(self._stride * model.height)
+        for i in range(model.height):
+
+            for j in range(model.width):
+                if model.kind(i, j) == model.LETTER_SQUARE:
+                    self._colors[i * self._stride + j] \
+                        = self._letterColor(self.masks[i * model.width + j])
+        # image made from the colors, None when it has to be made again
+        self._image = None
+
+################################################################################
+
+    def _letterColor(self, mask):
+        """
+        Returns color of a letter in the overview.
+        """
+
+        if mask == 0:
+            return self.FAILED_COLOR
+        elif POPCOUNT[mask] == 1:
+            return self.SOLVED_COLOR
+        else:
+            return self.UNSOLVED_COLOR
+
+################################################################################
+
+    def updateLetters(self, changes):
+        """
+        Sets new possible numbers of the changed letters and schedules repaint
+        of their squares only. Changes are given as a list of (index, possible
+        numbers) pairs, index being i * width + j.
+        """
+
+        width = self.model.width
+
+        for index, mask in changes:
+            self.masks[index] = mask
+            i, j = divmod(index, width)
+            self._colors[i * self._stride + j] = self._letterColor(mask)
+
+        self._image = None
+        if len(changes) > self.UPDATE_ALL_CHANGES:
+            self.update()
+        else:
+
+            for index, mask in changes:
+                i, j = divmod(index, width)
+                self.update(j * self.size, i * self.size, self.size, self.size)
+
+################################################################################
+
+    def boundingRect(self):
+        """
+        The whole grid.
+        """
+
+        return self._rect
+
+################################################################################
+
+    def paint(self, painter, option, widget=None):
+        """
+        Paints squares in the exposed part of the grid.
+        """
+
+        rect = option.exposedRect.intersected(self._rect)
+        if rect.isEmpty():
+            return
+
+        # range of squares in the exposed rectangle
+        top = max(0, floor(rect.top() / self.size))
+        bottom = min(self.model.height, ceil(rect.bottom() / self.size))
+        left = max(0, floor(rect.left() / self.size))
+        right = min(self.model.width, ceil(rect.right() / self.size))
+
+        detail = QStyleOptionGraphicsItem.levelOfDetailFromTransform(
+            painter.worldTransform())
+        if detail * self.size < self.DETAIL_PIXELS:
+            self._paintOverview(painter, top, bottom, left, right)
+        else:
+            self._paintSquares(painter, top, bottom, left, right)
+
+################################################################################
+
+    def _paintOverview(self, painter, top, bottom, left, right):
+        """
+        Paints the squares as colored blocks, scaling the part of the color
+        image they are in.
+        """
+
+        if self._image is None:
+            self._image = QImage(bytes(self._colors), self.model.width,
+                                 self.model.height, self._stride,
+                                 QImage.Format_Indexed8)
+            self._image.setColorTable(self.COLOR_TABLE)
+
+        painter.drawImage(QRectF(left * self.size, top * self.size,
+                                 (right - left) * self.size,
+                                 (bottom - top) * self.size),
+                          self._image,
+                          QRectF(left, top, right - left, bottom - top))
+
+################################################################################
+
+    def _paintSquares(self, painter, top, bottom, left, right):
+        """
+        Paints the squares with their clues and possible numbers.
+        """
+
+        size = self.size
+        width = self.model.width
+        painter.setPen(self.PEN)
+
+        for i in range(top, bottom):
+
+            for j in range(left, right):
+                kind = self.model.kind(i, j)
+                x = j * size
+                y = i * size
+
+                if kind == self.model.LETTER_SQUARE:
+                    self._paintLetter(painter, x, y, self.masks[i * width + j])
+                else:
+                    painter.setBrush(self.FILLER_BRUSH)
+                    painter.drawRect(QRectF(x, y, size, size))
+                    painter.setBrush(Qt.NoBrush)
+                    if kind == self.model.CLUE_SQUARE:
+                        self._paintClue(painter, x, y,
+                                        *self.model.clues(i, j))
+
+################################################################################
+
+    def _paintClue(self, painter, x, y, horizontal, vertical):
+        """
+        Paints the diagonal and the horizontal and vertical clues (None for no
+        clue) of a clue square.
+        """
+
+        half = self.size / 2
+        painter.drawLine(QLineF(x, y, x + self.size, y + self.size))
+        painter.setFont(self._smallFont)
+
+        if horizontal is not None:
+            painter.drawText(QRectF(x + half, y, half, half), Qt.AlignCenter,
+                             str(horizontal))
+        if vertical is not None:
+            painter.drawText(QRectF(x, y + half, half, half), Qt.AlignCenter,
+                             str(vertical))
+
+################################################################################
+
+    def _paintLetter(self, painter, x, y, mask):
+        """
+        Paints a square to fill: a solved letter as one big number, otherwise
+        its possible numbers in a 3x3 grid.
+        """
+
+        painter.drawRect(QRectF(x, y, self.size, self.size))
+
+        if POPCOUNT[mask] == 1:
+            painter.setPen(Qt.darkGreen)
+            painter.setFont(self._bigFont)
+            painter.drawText(QRectF(x, y, self.size, self.size),
+                             Qt.AlignCenter, str(NUMBERS[mask][0]))
+            painter.setPen(self.PEN)
+        else:
+            third = self.size / 3
+            painter.setFont(self._smallFont)
+
+            for number in NUMBERS[mask]:
+                painter.drawText(QRectF(x + ((number - 1) % 3) * third,
+                                        y + ((number - 1) // 3) * third,
+                                        third, third),
+                                 Qt.AlignCenter, str(number))
+
+################################################################################
@@ -0,0 +1,95 @@
+__author__ = "Tofu Gang"
+
+from PyQt5.QtWidgets import QGraphicsView
+
+
+
+################################################################################
+
+class GridView(QGraphicsView):
+    # zoom factor of one step of the mouse wheel
+    ZOOM_STEP = 1.25
+    # the largest zoom; the smallest one shows the whole grid
+    MAX_ZOOM = 4.0
+
+################################################################################
+
+    def __init__(self, scene, parent=None):
+        """
+        View of the puzzle which can be zoomed by the mouse wheel (towards the
+        cursor) and panned by dragging. Only the changed parts of the viewport
+        are repainted.
+        """
+
+        super(GridView, self).__init__(scene, parent)
+        self.setDragMode(QGraphicsView.ScrollHandDrag)
+        self.setTransformationAnchor(QGraphicsView.AnchorUnderMouse)
+        self.setViewportUpdateMode(QGraphicsView.MinimalViewportUpdate)
+        self.setOptimizationFlag(QGraphicsView.DontSavePainterState)
+
+################################################################################
+
+    def zoom(self):
+        """
+        Returns the current zoom factor.
+        """
+
+        return self.transform().m11()
+
+################################################################################
+
+    def zoomBy(self, factor):
+        """
+        Zooms by the factor, keeping the zoom between the one which fits the
+        whole grid into the view and MAX_ZOOM.
+        """
+
+        rect = self.sceneRect()
+        viewport = self.viewport().rect()
+        minZoom = min(1.0, viewport.width() / max(rect.width(), 1),
+                      viewport.height() / max(rect.height(), 1))
+        zoom = min(max(self.zoom() * factor, minZoom), self.MAX_ZOOM)
+        factor = zoom / self.zoom()
+        self.scale(factor, factor)
+
+################################################################################
+
+    def zoomIn(self):
+        """
+        Zooms in by one step.
+        """
+
+        self.zoomBy(self.ZOOM_STEP)
+
+################################################################################
+
+    def zoomOut(self):
+        """
+        Zooms out by one step.
+        """
+
+        self.zoomBy(1 / self.ZOOM_STEP)
+
+################################################################################
+
+    def fitGrid(self):
+        """
+        Shows the whole grid, but never zooms in above the natural size.
+        """
+
+        self.resetTransform()
+        self.zoomBy(1.0)
+
+################################################################################
+
+    def wheelEvent(self, event):
+        """
+        Zooms by the mouse wheel.
+        """
+
+        steps = event.angleDelta().y() / 120
+        if steps != 0:
+            self.zoomBy(self.ZOOM_STEP ** steps)
+        event.accept()
+
+################################################################################
@@ -0,0 +1,457 @@
+__author__ = "Tofu Gang"
+
+from PyQt5.QtCore import QThread
+from PyQt5.QtWidgets import QApplication, QMainWindow, QGraphicsScene, QToolBar, QAction, QFileDialog
+from PyQt5.QtGui import QIcon, QKeySequence
+from src.gui.gridItem import GridItem
+from src.gui.gridView import GridView
+from src.gui.solverWorker import SolverWorker
+from src.history import History
+from src.model import Model
+from src.solutionCache import SolutionCache, fingerprint, applySolution
+import json
+import os
+
+
+
+################################################################################
+
+class MainWindow(QMainWindow):
+    SQUARE_SIZE = 50
+    # puzzles solved before are taken from here
+    SOLUTION_CACHE_FILE = os.path.join(os.path.expanduser('~'),
+                                       '.kakuro_solver', 'solutions.sqlite')
+
+################################################################################
+
+    def __init__(self, parent=None):
+        """
+        It creates main window of the application. Kakuro model isn't initiali-
+        zed here, though.
+        """
+
+        super(MainWindow, self).__init__(parent)
+        self.scene = QGraphicsScene(self)
+        # the scene holds just one item, it needs no index
+        self.scene.setItemIndexMethod(QGraphicsScene.NoIndex)
+        self.view = GridView(self.scene)
+        self.setCentralWidget(self.view)
+        self.model = None
+        # the whole puzzle is one item painting only the visible squares
+        self.gridItem = None
+        self.solutionCache = SolutionCache(self.SOLUTION_CACHE_FILE)
+        # fingerprint of the loaded puzzle, the same however far it is solved
+        self._fingerprint = None
+        # thread solving the puzzle and its worker, None when not solving
+        self._solverThread = None
+        self._solverWorker = None
+        # states of the step actions before the solving started
+        self._solvingBefore = None
+        # steps done on the puzzle, so they can be undone
+        self.history = None
+
+        # the compiled icons are registered with Qt when the first window needs
+        # them, not whenever the GUI package is imported
+        import res.resources_rc
+        self.openAction \
+            = QAction(QIcon(':/icons/open.png'), 'Open file', self)
+        self.openAction.setShortcut(QKeySequence.Open)
+        self.openAction.triggered.connect(self._loadFromFile)
+        self.solveAction \
+            = QAction(QIcon(':/icons/solve.png'), 'Solve automatically', self)
+        self.solveAction.triggered.connect(self._solve)
+        self.solveAction.setEnabled(False)
+        self.cancelAction \
+            = QAction(QIcon.fromTheme('process-stop'), 'Cancel solving', self)
+        self.cancelAction.setShortcut(QKeySequence.Cancel)
+        self.cancelAction.triggered.connect(self._cancelSolving)
+        self.cancelAction.setEnabled(False)
+        self.rawHeuristicAction \
+            = QAction(QIcon(':/icons/1.png'), 'Raw heuristic', self)
+        self.rawHeuristicAction.triggered.connect(self._rawHeuristic)
+        self.rawHeuristicAction.setEnabled(False)
+        self.contextSolutionsHeuristicAction \
+            = QAction(QIcon(':/icons/2.png'), 'Context solutions heuristic',
+                      self)
+        self.contextSolutionsHeuristicAction.triggered.connect(
+            self._contextSolutionsHeuristic)
+        self.contextSolutionsHeuristicAction.setEnabled(False)
+        self.generalizedRepetitionHeuristicAction \
+            = QAction(QIcon(':/icons/3.png'),
+                      'Generalized repetition heuristic', self)
+        self.generalizedRepetitionHeuristicAction.triggered.connect(
+            self._generalizedRepetitionHeuristic)
+        self.generalizedRepetitionHeuristicAction.setEnabled(False)
+        self.undoAction = QAction(QIcon.fromTheme('edit-undo'), 'Undo', self)
+        self.undoAction.setShortcut(QKeySequence.Undo)
+        self.undoAction.triggered.connect(self._undo)
+        self.undoAction.setEnabled(False)
+        self.redoAction = QAction(QIcon.fromTheme('edit-redo'), 'Redo', self)
+        self.redoAction.setShortcut(QKeySequence.Redo)
+        self.redoAction.triggered.connect(self._redo)
+        self.redoAction.setEnabled(False)
+        # actions whose state depends on the steps done on the puzzle, undone
+        # together with them
+        self.stepActions = (self.solveAction, self.rawHeuristicAction,
+                            self.contextSolutionsHeuristicAction,
+                            self.generalizedRepetitionHeuristicAction)
+        self.exportStatisticsAction \
+            = QAction(QIcon.fromTheme('document-save'), 'Export statistics', self)
+        self.exportStatisticsAction.triggered.connect(self._exportStatistics)
+        self.exportStatisticsAction.setEnabled(False)
+        self.zoomInAction \
+            = QAction(QIcon.fromTheme('zoom-in'), 'Zoom in', self)
+        self.zoomInAction.setShortcut(QKeySequence.ZoomIn)
+        self.zoomInAction.triggered.connect(self.view.zoomIn)
+        self.zoomOutAction \
+            = QAction(QIcon.fromTheme('zoom-out'), 'Zoom out', self)
+        self.zoomOutAction.setShortcut(QKeySequence.ZoomOut)
+        self.zoomOutAction.triggered.connect(self.view.zoomOut)
+        self.fitAction \
+            = QAction(QIcon.fromTheme('zoom-fit-best'), 'Show whole puzzle', self)
+        self.fitAction.triggered.connect(self.view.fitGrid)
+
+        self.toolBar = QToolBar('toolbar', self)
+        self.addToolBar(self.toolBar)
+        self.toolBar.addAction(self.openAction)
+        self.toolBar.addAction(self.solveAction)
+        self.toolBar.addAction(self.cancelAction)
+        self.toolBar.addAction(self.rawHeuristicAction)
+        self.toolBar.addAction(self.contextSolutionsHeuristicAction)
+        self.toolBar.addAction(self.generalizedRepetitionHeuristicAction)
+        self.toolBar.addAction(self.undoAction)
+        self.toolBar.addAction(self.redoAction)
+        self.toolBar.addAction(self.exportStatisticsAction)
+        self.toolBar.addAction(self.zoomInAction)
+        self.toolBar.addAction(self.zoomOutAction)
+        self.toolBar.addAction(self.fitAction)
+
+################################################################################
+
+    def _loadFromFile(self):
+        """
+        It opens a dialog to load a xml file, which is then parsed and shown
+        in the main window.
+        """
+
+        fileName = QFileDialog.getOpenFileName(self, 'Open file', '../puzzles/')[0]
+        # continue only if some file was really loaded
+        if len(fileName) > 0:
+            self.model = Model(fileName)
+            self._fingerprint = fingerprint(self.model)
+            # count what every heuristic does, so it can be exported
+            self.model.enableInstrumentation()
+            # only letters which change are repainted after every step
+            self.model.trackChanges()
+            self.history = History()
+            self.history.attach(self.model)
+            self._showModel()
+            self.rawHeuristicAction.setEnabled(True)
+            self.solveAction.setEnabled(True)
+            self.contextSolutionsHeuristicAction.setEnabled(False)
+            self.generalizedRepetitionHeuristicAction.setEnabled(False)
+            self.exportStatisticsAction.setEnabled(True)
+            self._updateHistoryActions()
+
+################################################################################
+
+    def _showModel(self):
+        """
+        Graphical representation of the puzzle model is created here, once
+        after the puzzle is loaded. Later changes are shown by _showChanges().
+        """
+
+        self.scene.clear()
+        self.model.takeChanges()
+        self.gridItem = GridItem(self.model, self.SQUARE_SIZE)
+        self.scene.addItem(self.gridItem)
+        self.scene.setSceneRect(self.gridItem.boundingRect())
+        # big puzzles do not fit on the screen, they are zoomed out instead
+        screen = QApplication.desktop().availableGeometry(self)
+        self.resize(min((self.model.width + 1) * self.SQUARE_SIZE,
+                        screen.width()),
+                    min((self.model.height + 1) * self.SQUARE_SIZE,
+                        screen.height()))
+        self.view.fitGrid()
+
+################################################################################
+
+    def _showChanges(self, changes=None):
+        """
+        Letters which changed are repainted here, the rest of the scene is left
+        as it is. Changes are given as a list of (index, possible numbers)
+        pairs, index being i * width + j; they are taken from the model if not
+        given.
+        """
+
+        if changes is None:
+            changes = self.model.takeChanges()
+
+        self.gridItem.updateLetters(changes)
+
+################################################################################
+
+    def _solve(self):
+        """
+        It solves the puzzle automatically, searching by trial and error when
+        the heuristics are not enough. Solving runs in another thread, so the
+        window stays responsive; letters are repainted as they change and
+        solving can be cancelled. Puzzles solved before are taken from the
+        solution cache instead.
+        """
+
+        # the whole solving is one step, undone at once
+        before = self._stepActionStates()
+        self.history.begin()
+
+        rows = self.solutionCache.get(self._fingerprint)
+        if rows is not None and applySolution(self.model, rows):
+            self._showChanges()
+            self.statusBar().showMessage('Solution taken from the cache')
+            # the puzzle is solved, disable everything so we can just load
+            # another puzzle
+            self.solveAction.setEnabled(False)
+            self.rawHeuristicAction.setEnabled(False)
+            self.contextSolutionsHeuristicAction.setEnabled(False)
+            self.generalizedRepetitionHeuristicAction.setEnabled(False)
+            self._endStep(before)
+            return
+
+        self._solvingBefore = before
+        # nothing can touch the model until the solving is finished
+        self.openAction.setEnabled(False)
+        self.solveAction.setEnabled(False)
+        self.rawHeuristicAction.setEnabled(False)
+        self.contextSolutionsHeuristicAction.setEnabled(False)
+        self.generalizedRepetitionHeuristicAction.setEnabled(False)
+        self.exportStatisticsAction.setEnabled(False)
+        self.undoAction.setEnabled(False)
+        self.redoAction.setEnabled(False)
+        self.cancelAction.setEnabled(True)
+
+        self._solverThread = QThread(self)
+        self._solverWorker = SolverWorker(self.model, search=True)
+        self._solverWorker.moveToThread(self._solverThread)
+        self._solverThread.started.connect(self._solverWorker.run)
+        self._solverWorker.progress.connect(self._showChanges)
+        self._solverWorker.finished.connect(self._solvingFinished)
+        self._solverWorker.finished.connect(self._solverThread.quit)
+        self._solverThread.finished.connect(self._solverWorker.deleteLater)
+        self._solverThread.finished.connect(self._solverThread.deleteLater)
+        self._solverThread.start()
+
+################################################################################
+
+    def _cancelSolving(self):
+        """
+        It asks the solving thread to stop.
+        """
+
+        if self._solverWorker is not None:
+            self._solverWorker.cancel()
+            self.cancelAction.setEnabled(False)
+
+################################################################################
+
+    def _solvingFinished(self, completed):
+        """
+        It is called when the solving thread finishes, cancelled or not.
+        """
+
+        self._solverThread = None
+        self._solverWorker = None
+        self._showChanges()
+        if self.model.isSolved():
+            self.solutionCache.put(self._fingerprint,
+                                   self.model.toText().split())
+        self.cancelAction.setEnabled(False)
+        self.openAction.setEnabled(True)
+        self.exportStatisticsAction.setEnabled(True)
+        # the puzzle is solved (or cannot be solved), disable everything so we
+        # can just load another puzzle; a cancelled solving can be started
+        # again
+        self.solveAction.setEnabled(not completed)
+        self._endStep(self._solvingBefore)
+
+################################################################################
+
+    def closeEvent(self, event):
+        """
+        It stops the solving thread and closes the solution cache before the
+        window is closed.
+        """
+
+        if self._solverThread is not None:
+            self._solverWorker.cancel()
+            self._solverThread.quit()
+            self._solverThread.wait()
+        self.solutionCache.close()
+        super(MainWindow, self).closeEvent(event)
+
+################################################################################
+
+    def _rawHeuristic(self):
+        """
+        It applies raw heuristic on the puzzle.
+        """
+
+        before = self._stepActionStates()
+        self.history.begin()
+        self.model.rawHeuristic()
+        self._showChanges()
+        if self.model.isSolved():
+            # the puzzle is solved, disable everything so we can just load
+            # another puzzle
+            self.solveAction.setEnabled(False)
+            self.rawHeuristicAction.setEnabled(False)
+            self.contextSolutionsHeuristicAction.setEnabled(False)
+            self.generalizedRepetitionHeuristicAction.setEnabled(False)
+        else:
+            # raw heuristic can be run only once (at least it has effect only on
+            # the first run)
+            self.rawHeuristicAction.setEnabled(False)
+            # now we can enable two more precise heuristics
+            self.contextSolutionsHeuristicAction.setEnabled(True)
+            self.generalizedRepetitionHeuristicAction.setEnabled(True)
+        self._endStep(before)
+
+################################################################################
+
+    def _contextSolutionsHeuristic(self):
+        """
+        It applies context solutions heuristic on the puzzle.
+        """
+
+        before = self._stepActionStates()
+        self.history.begin()
+        modelChanged = self.model.contextSolutionsHeuristic()
+        self._showChanges()
+        if self.model.isSolved():
+            # the puzzle is solved, disable everything so we can just load
+            # another puzzle
+            self.solveAction.setEnabled(False)
+            self.rawHeuristicAction.setEnabled(False)
+            self.contextSolutionsHeuristicAction.setEnabled(False)
+            self.generalizedRepetitionHeuristicAction.setEnabled(False)
+        else:
+            # if any changes were made, leave the action enabled, disable it otherwise
+            self.contextSolutionsHeuristicAction.setEnabled(modelChanged)
+            # if any changes were made, enable the repetition heuristic, leave it as
+            # it is otherwise (it may have not be used at all and in this case we
+            # want to have it enabled)
+            if modelChanged:
+                self.generalizedRepetitionHeuristicAction.setEnabled(True)
+        self._endStep(before)
+
+################################################################################
+
+    def _generalizedRepetitionHeuristic(self):
+        """
+        It applies generalized repetition heuristic on the puzzle.
+        """
+
+        before = self._stepActionStates()
+        self.history.begin()
+        modelChanged = self.model.generalizedRepetitionHeuristic()
+        self._showChanges()
+        if self.model.isSolved():
+            # the puzzle is solved, disable everything so we can just load
+            # another puzzle
+            self.solveAction.setEnabled(False)
+            self.rawHeuristicAction.setEnabled(False)
+            self.contextSolutionsHeuristicAction.setEnabled(False)
+            self.generalizedRepetitionHeuristicAction.setEnabled(False)
+        else:
+            # if any changes were made, leave the action enabled, disable it otherwise
+            self.generalizedRepetitionHeuristicAction.setEnabled(modelChanged)
+            # if any changes were made, enable the context solutions heuristic,
+            # leave it as it is otherwise (it may have not be used at all and in
+            # this case we want to have it enabled)
+            if modelChanged:
+                self.contextSolutionsHeuristicAction.setEnabled(True)
+        self._endStep(before)
+
+################################################################################
+
+    def _stepActionStates(self):
+        """
+        It returns which of the step actions are enabled.
+        """
+
+        return tuple(action.isEnabled() for action in self.stepActions)
+
+################################################################################
+
+    def _setStepActionStates(self, states):
+        """
+        It enables the step actions as returned by _stepActionStates().
+        """
+
+        for action, enabled in zip(self.stepActions, states):
+            action.setEnabled(enabled)
+
+################################################################################
+
+    def _endStep(self, before):
+        """
+        It finishes the step started by history.begin(), remembering the states
+        of the step actions before and after it, so that undo and redo can
+        bring them back too.
+        """
+
+        self.history.end((before, self._stepActionStates()))
+        self._updateHistoryActions()
+
+################################################################################
+
+    def _updateHistoryActions(self):
+        """
+        It enables undo and redo if there is something to undo or redo.
+        """
+
+        self.undoAction.setEnabled(self.history.canUndo())
+        self.redoAction.setEnabled(self.history.canRedo())
+
+################################################################################
+
+    def _undo(self):
+        """
+        It takes back the last step; only the letters it changed are repainted.
+        """
+
+        before, after = self.history.undo()
+        self._showChanges()
+        self._setStepActionStates(before)
+        self._updateHistoryActions()
+
+################################################################################
+
+    def _redo(self):
+        """
+        It makes the last undone step again; only the letters it changed are
+        repainted.
+        """
+
+        before, after = self.history.redo()
+        self._showChanges()
+        self._setStepActionStates(after)
+        self._updateHistoryActions()
+
+################################################################################
+
+    def _exportStatistics(self):
+        """
+        It opens a dialog to save counters of the heuristics and the search
+        applied to the puzzle so far as a JSON file.
+        """
+
+        fileName = QFileDialog.getSaveFileName(self, 'Export statistics', '',
+                                               'JSON files (*.json)')[0]
+        # continue only if some file was really chosen
+        if len(fileName) > 0:
+            statistics = self.model.statistics()
+            statistics['solutionCache'] = self.solutionCache.statistics()
+            with open(fileName, 'w') as f:
+                json.dump(statistics, f, indent=1)
+
+################################################################################
@@ -0,0 +1,83 @@
+__author__ = "Tofu Gang"
+
+from time import perf_counter
+from PyQt5.QtCore import QObject, pyqtSignal, pyqtSlot
+from src.model import Model
+
+
+
+################################################################################
+
+class SolverWorker(QObject):
+    # changed letters as a list of (index, possible numbers) pairs, index being
+    # i * width + j
+    progress = pyqtSignal(list)
+    # True if solving ran to the end, False if it was cancelled
+    finished = pyqtSignal(bool)
+    # at most this many progress signals per second, one per frame at 60 fps
+    PROGRESS_RATE = 60
+
+################################################################################
+
+    def __init__(self, model, search=True):
+        """
+        Creates a worker solving the model. It is meant to be moved to a
+        QThread; the model must not be touched by anybody else until finished
+        is emitted. Letters changed meanwhile are taken from the model and sent
+        by the progress signal at most PROGRESS_RATE times per second, so the
+        GUI repaints only what changed and never more often than it can show.
+        """
+
+        super(SolverWorker, self).__init__()
+        self.model = model
+        self.model.trackChanges()
+        self.search = search
+        self._lastProgress = 0.0
+
+################################################################################
+
+    @pyqtSlot()
+    def run(self):
+        """
+        Solves the model. Runs in the worker thread.
+        """
+
+        result = self.model.solve(search=self.search, cancel=self._poll)
+        self._emitProgress()
+        self.finished.emit(result.status != Model.CANCELLED)
+
+################################################################################
+
+    def cancel(self):
+        """
+        Asks the solver to stop as soon as possible. It can be called from any
+        thread.
+        """
+
+        self.model.cancel()
+
+################################################################################
+
+    def _poll(self):
+        """
+        Called by the solver now and then: sends the progress if it is time to.
+        It never stops the solver, cancel() does.
+        """
+
+        if perf_counter() - self._lastProgress >= 1 / self.PROGRESS_RATE:
+            self._emitProgress()
+        return False
+
+################################################################################
+
+    def _emitProgress(self):
+        """
+        Sends letters changed since the last progress, if there are any.
+        """
+
+        self._lastProgress = perf_counter()
+        changes = self.model.takeChanges()
+        if len(changes) > 0:
+            self.progress.emit(changes)
+
+################################################################################
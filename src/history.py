@@ -0,0 +1,217 @@
+__author__ = "Tofu Gang"
+
+from array import array
+from collections import deque
+
+
+
+################################################################################
+
+# the most letter changes kept by default, in all the steps together; a change
+# takes 6 bytes, so the history of any puzzle stays within a few megabytes
+HISTORY_LIMIT = 1 << 20
+
+################################################################################
+
+class Step(object):
+    __slots__ = ('indexes', 'oldMasks', 'newMasks', 'data')
+
+################################################################################
+
+    def __init__(self, indexes, oldMasks, newMasks, data):
+        """
+        One step of the history: indexes of the letters it changed (i * width
+        + j), their possible numbers before and after the step and anything
+        the caller wants back when the step is undone or redone.
+        """
+
+        self.indexes = indexes
+        self.oldMasks = oldMasks
+        self.newMasks = newMasks
+        self.data = data
+
+################################################################################
+
+    def __len__(self):
+        """
+        Number of letters changed by the step.
+        """
+
+        return len(self.indexes)
+
+################################################################################
+
+class History(object):
+
+################################################################################
+
+    def __init__(self, limit=HISTORY_LIMIT):
+        """
+        Undo and redo history of a model. Every step keeps only the letters it
+        changed and their previous and new possible numbers, not copies of the
+        whole puzzle, so undoing or redoing a step takes time of its changes
+        only. When the steps together hold more than limit changes, the
+        oldest ones are forgotten. Nothing is recorded until attach() is
+        called.
+        """
+
+        self.limit = limit
+        self._model = None
+        self._undoSteps = deque()
+        self._redoSteps = []
+        # changes held by all the steps
+        self._size = 0
+        # previous masks of letters changed by the step being recorded, by
+        # their indexes; None when no step is being recorded
+        self._changes = None
+        # set while a step is being undone or redone
+        self._applying = False
+
+################################################################################
+
+    def attach(self, model):
+        """
+        Starts watching changes of the model.
+        """
+
+        self._model = model
+        model.addObserver(self.domainChanged)
+
+################################################################################
+
+    def detach(self, model):
+        """
+        Stops watching changes of the model and forgets all the steps.
+        """
+
+        model.removeObserver(self.domainChanged)
+        self._model = None
+        self.clear()
+
+################################################################################
+
+    def domainChanged(self, index, oldMask, newMask):
+        """
+        Observer of the model: remembers the first previous mask of every letter
+        changed by the step being recorded. A change made outside of any step
+        (and not by undo() or redo()) leaves the model in a state the steps do
+        not lead to, so the whole history is forgotten.
+        """
+
+        if self._changes is not None:
+            if index not in self._changes:
+                self._changes[index] = oldMask
+        elif not self._applying:
+            self.clear()
+
+################################################################################
+
+    def begin(self):
+        """
+        Starts recording a step: all the changes of the model until end() make
+        up the step.
+        """
+
+        self._changes = {}
+
+################################################################################
+
+    def end(self, data=None):
+        """
+        Finishes recording the step started by begin() and stores it with the
+        data, which undo() and redo() return later. Steps undone before are
+        forgotten, they cannot be redone any more. Returns False if the step
+        changed nothing, in which case nothing is stored.
+        """
+
+        changes = self._changes
+        self._changes = None
+        domains = self._model._domains
+        # letters changed and changed back again are not part of the step
+        indexes = array('l', (index for index, mask in changes.items()
+                              if domains[index] != mask))
+        if len(indexes) == 0:
+            return False
+
+        step = Step(indexes, array('H', (changes[index] for index in indexes)),
+                    array('H', (domains[index] for index in indexes)), data)
+        for redoStep in self._redoSteps:
+            self._size -= len(redoStep)
+        self._redoSteps = []
+        self._undoSteps.append(step)
+        self._size += len(step)
+
+        while self._size > self.limit and len(self._undoSteps) > 0:
+            self._size -= len(self._undoSteps.popleft())
+
+        return True
+
+################################################################################
+
+    def canUndo(self):
+        """
+        Returns True if there is a step to undo.
+        """
+
+        return len(self._undoSteps) > 0
+
+################################################################################
+
+    def canRedo(self):
+        """
+        Returns True if there is an undone step to redo.
+        """
+
+        return len(self._redoSteps) > 0
+
+################################################################################
+
+    def undo(self):
+        """
+        Brings the letters changed by the last step back to their previous
+        possible numbers. Returns data of the step.
+        """
+
+        step = self._undoSteps.pop()
+        self._apply(step.indexes, step.oldMasks)
+        self._redoSteps.append(step)
+        return step.data
+
+################################################################################
+
+    def redo(self):
+        """
+        Makes the last undone step again. Returns data of the step.
+        """
+
+        step = self._redoSteps.pop()
+        self._apply(step.indexes, step.newMasks)
+        self._undoSteps.append(step)
+        return step.data
+
+################################################################################
+
+    def _apply(self, indexes, masks):
+        """
+        Sets the letters to the masks through the model, so its observers (and
+        views of it) see the changes as usual.
+        """
+
+        self._applying = True
+        try:
+            self._model.restoreLetters(zip(indexes, masks))
+        finally:
+            self._applying = False
+
+################################################################################
+
+    def clear(self):
+        """
+        Forgets all the steps.
+        """
+
+        self._undoSteps.clear()
+        self._redoSteps = []
+        self._size = 0
+
+################################################################################
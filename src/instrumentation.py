@@ -0,0 +1,179 @@
+__author__ = "Tofu Gang"
+
+from time import perf_counter
+from src.model import POPCOUNT
+
+
+
+################################################################################
+
+class RuleStats(object):
+    __slots__ = ('calls', 'eliminations', 'seconds')
+
+################################################################################
+
+    def __init__(self):
+        """
+        Counters of one rule: how many times it was applied to a word, how many
+        possible numbers it excluded and how long it took.
+        """
+
+        self.calls = 0
+        self.eliminations = 0
+        self.seconds = 0.0
+
+################################################################################
+
+    def summary(self):
+        """
+        Returns the counters as a dictionary.
+        """
+
+        return {'calls': self.calls, 'eliminations': self.eliminations,
+                'seconds': self.seconds}
+
+################################################################################
+
+class Instrumentation(object):
+
+################################################################################
+
+    def __init__(self, observer=None):
+        """
+        Creates counters for a model: per rule (calls, excluded numbers, time),
+        per round of the propagation and in total. The observer, if given, is
+        called on every change of possible numbers just like the model
+        observers are. Nothing is counted until attach() is called.
+        """
+
+        self.rules = {}
+        self.rounds = []
+        self.changes = 0
+        self.eliminations = 0
+        self.observer = observer
+        # rule being applied right now, excluded numbers are counted to it
+        self._rule = None
+        # state at the start of the current round
+        self._roundStart = None
+        self._roundEliminations = 0
+
+################################################################################
+
+    def attach(self, model):
+        """
+        Starts counting in the model.
+        """
+
+        model.instrumentation = self
+        model.addObserver(self.domainChanged)
+
+################################################################################
+
+    def detach(self, model):
+        """
+        Stops counting in the model.
+        """
+
+        model.removeObserver(self.domainChanged)
+        model.instrumentation = None
+
+################################################################################
+
+    def domainChanged(self, index, oldMask, newMask):
+        """
+        Observer of the model: counts the change and numbers excluded by it to
+        the rule being applied.
+        """
+
+        eliminated = POPCOUNT[oldMask & ~newMask]
+        self.changes += 1
+        self.eliminations += eliminated
+        if self._rule is not None:
+            self._rule.eliminations += eliminated
+        if self.observer is not None:
+            self.observer(index, oldMask, newMask)
+
+################################################################################
+
+    def wrapRule(self, name, apply):
+        """
+        Returns the rule method wrapped so that its calls, excluded numbers and
+        time are counted.
+        """
+
+        stats = self.rules.get(name)
+        if stats is None:
+            stats = self.rules[name] = RuleStats()
+
+        def countedApply(run):
+            previous = self._rule
+            self._rule = stats
+            start = perf_counter()
+            try:
+                return apply(run)
+            finally:
+                stats.seconds += perf_counter() - start
+                stats.calls += 1
+                self._rule = previous
+
+        return countedApply
+
+################################################################################
+
+    def startRound(self):
+        """
+        Marks the start of a propagation round.
+        """
+
+        self._roundStart = perf_counter()
+        self._roundEliminations = self.eliminations
+
+################################################################################
+
+    def finishRound(self, runs):
+        """
+        Records the round started by startRound(), in which the rules were
+        applied to the given number of words.
+        """
+
+        self.rounds.append({
+            'runs': runs,
+            'eliminations': self.eliminations - self._roundEliminations,
+            'seconds': perf_counter() - self._roundStart
+        })
+
+################################################################################
+
+    def summary(self):
+        """
+        Returns all the counters as a dictionary.
+        """
+
+        return {
+            'rules': {name: stats.summary()
+                      for name, stats in self.rules.items()},
+            'rounds': list(self.rounds),
+            'changes': self.changes,
+            'eliminations': self.eliminations
+        }
+
+################################################################################
+
+def profileCall(function, fileName=None):
+    """
+    Calls the function under cProfile. Returns pstats.Stats of the call and
+    writes them to the file if its name is given, in the format read by
+    pstats, snakeviz and the other cProfile tools.
+    """
+
+    # the profiler takes longer to import than the solver, load it only when
+    # something is profiled
+    import cProfile
+    import pstats
+    profile = cProfile.Profile()
+    profile.runcall(function)
+    if fileName is not None:
+        profile.dump_stats(fileName)
+    return pstats.Stats(profile)
+
+################################################################################
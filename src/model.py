@@ -1,10 +1,309 @@
 __author__ = "Tofu Gang"
 
-from itertools import combinations, product
-from collections import defaultdict
+from itertools import combinations
+from collections import defaultdict, namedtuple, deque
+from functools import lru_cache, partial
+from time import perf_counter
+from array import array
 
 
 
+################################################################################
+
+# Possible numbers of a letter are kept as a 9-bit mask, number n being the
+# bit (n - 1). These tables turn the usual questions about a mask into a single
+# lookup.
+ALL_NUMBERS = 0b111111111
+NUMBER_BITS = tuple(1 << (number - 1) for number in range(1, 10))
+# count of possible numbers in the mask
+POPCOUNT = tuple(bin(mask).count('1') for mask in range(ALL_NUMBERS + 1))
+# possible numbers in the mask in ascending order
+NUMBERS = tuple(tuple(number for number in range(1, 10)
+                      if mask & NUMBER_BITS[number - 1])
+                for mask in range(ALL_NUMBERS + 1))
+
+################################################################################
+
+def numbersMask(numbers):
+    """
+    Returns the mask of the given possible numbers.
+    """
+
+    mask = 0
+    for number in numbers:
+        mask |= NUMBER_BITS[number - 1]
+    return mask
+
+################################################################################
+
+def isSingleton(mask):
+    """
+    Returns True if there is exactly one possible number in the mask.
+    """
+
+    return mask != 0 and mask & (mask - 1) == 0
+
+################################################################################
+
+def _sumBounds():
+    """
+    Computes the smallest and the largest sum of N different numbers taken from
+    every mask, N going from 0 to 9. Sums which cannot be made (there are less
+    than N numbers in the mask) are out of the range of any clue.
+    """
+
+    minSums = []
+    maxSums = []
+
+    for count in range(10):
+        minSums.append(tuple(sum(NUMBERS[mask][:count])
+                             if POPCOUNT[mask] >= count else 46
+                             for mask in range(ALL_NUMBERS + 1)))
+        maxSums.append(tuple(sum(NUMBERS[mask][POPCOUNT[mask] - count:])
+                             if POPCOUNT[mask] >= count else -1
+                             for mask in range(ALL_NUMBERS + 1)))
+
+    return tuple(minSums), tuple(maxSums)
+
+################################################################################
+
+MIN_SUMS, MAX_SUMS = _sumBounds()
+# numbers from low to high, by (low, high); empty if low > high
+RANGE_MASKS = tuple(tuple(sum(NUMBER_BITS[low - 1:high]) for high in range(10))
+                    for low in range(10))
+
+################################################################################
+
+def _tails(word):
+    """
+    Returns masks of numbers possible in the letters of the word from the
+    given position to the end, for every position (and one more for the end
+    itself).
+    """
+
+    tails = [0] * (len(word) + 1)
+    for position in range(len(word) - 1, -1, -1):
+        tails[position] = tails[position + 1] | word[position]
+    return tails
+
+################################################################################
+
+# how many words (clues with possible numbers masks of their letters) are
+# remembered by wordSupport(); the same words come again and again, both in
+# the following rounds of one puzzle and in other puzzles
+SUPPORT_CACHE_SIZE = 1 << 15
+
+################################################################################
+
+@lru_cache(maxsize=SUPPORT_CACHE_SIZE)
+def wordSupport(clue, word):
+    """
+    Returns for every letter of the word with given clue and possible numbers
+    masks of its letters (a tuple) the mask of numbers which appear on its
+    position in at least one solution of the word. Solutions are not listed
+    one by one: the numbers used so far tell both the position and the sum
+    reached, so every set of used numbers is searched only once, and a branch
+    is left as soon as the rest of the word can no longer sum up to the clue.
+    Numbers already used in the word are not tried again. Results of the last
+    SUPPORT_CACHE_SIZE words are remembered, shared by all the models in the
+    process.
+    """
+
+    length = len(word)
+    tails = _tails(word)
+    support = [0] * length
+    # sets of used numbers already searched, whether they lead to a solution
+    known = {}
+
+    def complete(used, remaining):
+        position = POPCOUNT[used]
+        if position == length:
+            return remaining == 0
+
+        result = known.get(used)
+        if result is not None:
+            return result
+
+        result = False
+        free = tails[position] & ~used
+        left = length - position
+        if MIN_SUMS[left][free] <= remaining <= MAX_SUMS[left][free]:
+
+            for number in NUMBERS[word[position] & ~used]:
+                if number > remaining:
+                    break
+                bit = NUMBER_BITS[number - 1]
+                if complete(used | bit, remaining - number):
+                    support[position] |= bit
+                    result = True
+
+        known[used] = result
+        return result
+
+    complete(0, clue)
+    return tuple(support)
+
+################################################################################
+
+def supportCacheStatistics():
+    """
+    Returns dictionary with hits, misses, hit rate and size of the cache of
+    wordSupport() since the process started (or the cache was cleared).
+    """
+
+    info = wordSupport.cache_info()
+    lookups = info.hits + info.misses
+    return {
+        'hits': info.hits,
+        'misses': info.misses,
+        'hitRate': info.hits / lookups if lookups > 0 else 0.0,
+        'entries': info.currsize,
+        'maxEntries': info.maxsize
+    }
+
+################################################################################
+
+def clearSupportCache():
+    """
+    Forgets all the words remembered by wordSupport() and resets its
+    counters.
+    """
+
+    wordSupport.cache_clear()
+
+################################################################################
+
+# Cheat sheet entry for a word of given length and clue: masks of all number
+# combinations summing up to the clue, mask of numbers which appear in at least
+# one of them and mask of numbers which appear in all of them.
+CrossSum = namedtuple('CrossSum', ('combinations', 'possible', 'required'))
+
+################################################################################
+
+def _crossSums():
+    """
+    Computes the whole cheat sheet, for every word length from 1 to 9 and every
+    clue from 1 to 45. It is done only once, when the module is imported.
+    """
+
+    table = {}
+
+    for length in range(1, 10):
+        # combinations of the length are listed once and sorted by their sums
+        sums = defaultdict(list)
+        for combination in combinations(range(1, 10), length):
+            sums[sum(combination)].append(numbersMask(combination))
+
+        for clue in range(1, 46):
+            combs = tuple(sums.get(clue, ()))
+            possible = 0
+            required = ALL_NUMBERS if len(combs) > 0 else 0
+
+            for comb in combs:
+                possible |= comb
+                required &= comb
+            table[(length, clue)] = CrossSum(combs, possible, required)
+
+    return table
+
+################################################################################
+
+CROSS_SUMS = _crossSums()
+NO_CROSS_SUM = CrossSum((), 0, 0)
+
+################################################################################
+
+def crossSum(length, clue):
+    """
+    Returns cheat sheet entry for a word with given length and clue. Words
+    with no solution at all get an entry with no combinations.
+    """
+
+    return CROSS_SUMS.get((length, clue), NO_CROSS_SUM)
+
+################################################################################
+
+# One word of the puzzle: its orientation (Model.HORIZONTAL or Model.VERTICAL),
+# its clue, its letters as indexes into Model._domains and the width of the
+# puzzle. The ordered coordinates of the letters are worked out from the
+# indexes when they are asked for, so they take no memory.
+class Run(namedtuple('Run', ('orientation', 'clue', 'indexes', 'width'))):
+    __slots__ = ()
+
+################################################################################
+
+    @property
+    def cells(self):
+        """
+        Returns the ordered coordinates of the letters of the word.
+        """
+
+        return tuple(divmod(index, self.width) for index in self.indexes)
+
+################################################################################
+
+class Runs(object):
+    __slots__ = ('width', '_orientations', '_clues', '_starts', '_lengths')
+
+################################################################################
+
+    def __init__(self, width):
+        """
+        Words of a puzzle of the given width, kept in flat arrays: orientation,
+        clue, index of the first letter and length of every word. A Run is
+        made only when a word is asked for, so a big puzzle does not keep an
+        object for every word. It is a read-only sequence of Runs like a
+        tuple.
+        """
+
+        self.width = width
+        self._orientations = bytearray()
+        self._clues = array('H')
+        self._starts = array('i')
+        self._lengths = array('H')
+
+################################################################################
+
+    def append(self, orientation, clue, start, length):
+        """
+        Adds the word with letters from the index start on, to the right for
+        a horizontal one and down for a vertical one.
+        """
+
+        self._orientations.append(ord(orientation))
+        self._clues.append(clue)
+        self._starts.append(start)
+        self._lengths.append(length)
+
+################################################################################
+
+    def __len__(self):
+        return len(self._starts)
+
+################################################################################
+
+    def __getitem__(self, runIndex):
+        orientation = chr(self._orientations[runIndex])
+        start = self._starts[runIndex]
+        step = 1 if orientation == Model.HORIZONTAL else self.width
+        return Run(orientation, self._clues[runIndex],
+                   range(start, start + self._lengths[runIndex] * step, step),
+                   self.width)
+
+################################################################################
+
+    def __iter__(self):
+        for runIndex in range(len(self._starts)):
+            yield self[runIndex]
+
+################################################################################
+
+# What Model.solve() ended with: its status (Model.SOLVED, STALLED, UNSOLVABLE,
+# EXHAUSTED or CANCELLED), number of letters left unsolved and of possible
+# numbers left in them, words propagated, search nodes and seconds it took.
+SolveResult = namedtuple('SolveResult', ('status', 'unsolved', 'candidates',
+                                         'steps', 'nodes', 'seconds'))
+
 ################################################################################
 
 class Model(object):
@@ -14,18 +313,143 @@ class Model(object):
     CLUES_DELIMITER = '-'
     HORIZONTAL = 'H'
     VERTICAL = 'V'
+    # kinds of squares, as kept in Model._kinds
+    FILLER_SQUARE = 0
+    LETTER_SQUARE = 1
+    CLUE_SQUARE = 2
+    # rules which can be plugged into the propagation, each applied to one word
+    RAW_HEURISTIC = 'rawHeuristic'
+    CROSS_RUN_LIMITS = 'crossRunLimits'
+    REQUIRED_NUMBERS = 'requiredNumbers'
+    HIDDEN_SINGLES = 'hiddenSingles'
+    HIDDEN_PAIRS = 'hiddenPairs'
+    CONTEXT_SOLUTIONS = 'contextSolutions'
+    GENERALIZED_REPETITION = 'generalizedRepetition'
+    RULE_METHODS = {
+        RAW_HEURISTIC: '_applyRawHeuristicRule',
+        CROSS_RUN_LIMITS: '_applyLimitsRule',
+        REQUIRED_NUMBERS: '_applyRequiredNumbersRule',
+        HIDDEN_SINGLES: '_applyHiddenSinglesRule',
+        HIDDEN_PAIRS: '_applyHiddenPairsRule',
+        CONTEXT_SOLUTIONS: '_applySolutionsRule',
+        GENERALIZED_REPETITION: '_applyDuplicatesRule'
+    }
+    # order in which enabled rules are applied to a word, the cheap ones first
+    RULE_ORDER = (CROSS_RUN_LIMITS, REQUIRED_NUMBERS, HIDDEN_SINGLES,
+                  HIDDEN_PAIRS, CONTEXT_SOLUTIONS, GENERALIZED_REPETITION)
+    # words propagated between two questions whether solve() is cancelled
+    CANCEL_STEPS = 64
+    # statuses of SolveResult: solved, the rules got stuck (without search),
+    # there is no solution, the time or a budget ran out, cancelled
+    SOLVED = 'solved'
+    STALLED = 'stalled'
+    UNSOLVABLE = 'unsolvable'
+    EXHAUSTED = 'exhausted'
+    CANCELLED = 'cancelled'
 
 ################################################################################
 
-    def __init__(self, fileName):
+    def __init__(self, fileName=None):
         """
-        Creates a model of Kakuro puzzle by parsing a xml file in the given path.
+        Creates a model of Kakuro puzzle by parsing a text file in the given
+        path. Without the path, the model is left empty to be loaded by
+        fromLines().
         """
 
-        self.grid = []
+        # kind of every square and its horizontal and vertical clue (0 for no
+        # clue), row by row like the possible numbers
+        self._kinds = bytearray()
+        self._horizontalClues = array('H')
+        self._verticalClues = array('H')
+        self._domains = array('H')
         self.width = None
         self.height = None
-        self._loadFromFile(fileName)
+        self.runs = Runs(0)
+        # index of the horizontal and vertical word of every square (-1 for
+        # none) and indexes of all the letters, in the order they were found
+        self._horizontalRuns = array('i')
+        self._verticalRuns = array('i')
+        self._letters = array('i')
+        # rules applied by propagate(), in this order
+        self.rules = [self.CONTEXT_SOLUTIONS, self.GENERALIZED_REPETITION]
+        # words waiting for the propagation, None when it is not running
+        self._queue = None
+        self._queued = None
+        # set when a letter is left with no possible numbers
+        self._failed = False
+        # previous possible numbers of changed letters, None when the search
+        # is not running
+        self._trail = None
+        # function asked now and then whether solve() should stop, whether it
+        # said so and why (EXHAUSTED or CANCELLED)
+        self._cancel = None
+        self._cancelled = False
+        self._stopStatus = None
+        # set by cancel() from another thread
+        self._cancelRequested = False
+        # words propagated by the last solve()
+        self.propagationSteps = 0
+        # counters of the last search
+        self.searchNodes = 0
+        self.searchBacktracks = 0
+        self.searchMaxDepth = 0
+        # functions called on every change of possible numbers
+        self._observers = []
+        # counters of rules and rounds, None when switched off
+        self.instrumentation = None
+        # indexes of letters changed since the last takeChanges(), None until
+        # trackChanges() is called
+        self._changed = None
+        if fileName is not None:
+            self._loadFromFile(fileName)
+
+################################################################################
+
+    def __getstate__(self):
+        """
+        The model is pickled (to be sent to other processes) without its
+        observers, instrumentation and collected changes, which belong to the
+        process it was created in.
+        """
+
+        state = self.__dict__.copy()
+        state['_observers'] = []
+        state['instrumentation'] = None
+        state['_changed'] = None
+        state['_cancel'] = None
+        return state
+
+################################################################################
+
+    @classmethod
+    def fromLines(cls, lines):
+        """
+        Creates a model of Kakuro puzzle from the rows of the text format, for
+        puzzles which do not come from a file of their own.
+        """
+
+        model = cls()
+        model._loadFromLines(lines)
+        return model
+
+################################################################################
+
+    @classmethod
+    def fromArrays(cls, width, height, kinds, horizontalClues, verticalClues,
+                   given=None):
+        """
+        Creates a model of Kakuro puzzle from the arrays it is kept in, row by
+        row: a bytearray of kinds of squares (FILLER_SQUARE, LETTER_SQUARE or
+        CLUE_SQUARE) and arrays of horizontal and vertical clues (0 for no
+        clue). given maps indexes (i * width + j) of letters given in the
+        puzzle to masks of their numbers. The arrays are kept by the model,
+        not copied.
+        """
+
+        model = cls()
+        model._loadFromArrays(width, height, kinds, horizontalClues,
+                              verticalClues, {} if given is None else given)
+        return model
 
 ################################################################################
 
@@ -35,289 +459,773 @@ class Model(object):
         """
 
         with open(fileName, 'r') as f:
-            lines = f.read().split()
-            self.height = len(lines)
-
-            for line in lines:
-                tokens = line.split(self.TOKENS_DELIMITER)
-                modelRow = []
-
-                for token in tokens:
-                    if token == self.EMPTY:
-                        modelRow.append(None)
-                    elif token == self.LETTER:
-                        modelRow.append([number for number in range(1, 10)])
-                    else:
-                        clueTokens = token.split(self.CLUES_DELIMITER)
-                        if len(clueTokens) != 2:
-                            # TODO: error handling
-                            pass
-
-                        horizontalClue = None
-                        verticalClue = None
-                        clueToken1 = clueTokens[0]
-                        if clueToken1.__contains__(self.VERTICAL):
-                            try:
-                                verticalClue = int(clueToken1.lstrip(self.VERTICAL))
-                            except ValueError:
-                                pass
-                        elif clueToken1.__contains__(self.HORIZONTAL):
-                            try:
-                                horizontalClue = int(clueToken1.lstrip(self.HORIZONTAL))
-                            except ValueError:
-                                pass
-                        else:
-                            # TODO: error handling
-                            pass
-
-                        clueToken2 = clueTokens[1]
-                        if clueToken2.__contains__(self.VERTICAL):
-                            try:
-                                verticalClue = int(clueToken2.lstrip(self.VERTICAL))
-                            except ValueError:
-                                pass
-                        elif clueToken2.__contains__(self.HORIZONTAL):
-                            try:
-                                horizontalClue = int(clueToken2.lstrip(self.HORIZONTAL))
-                            except ValueError:
-                                pass
-                        else:
-                            # TODO: error handling
-                            pass
-
-                        modelRow.append({
-                            self.HORIZONTAL: horizontalClue,
-                            self.VERTICAL: verticalClue
-                        })
-                if self.width is None:
-                    self.width = len(modelRow)
-                elif len(modelRow) != self.width:
-                    # TODO: error handling
-                    pass
-                self.grid.append(modelRow)
-
-
-################################################################################
-
-    def _word(self, i, j, orientation, hashable=True):
-        """
-        Returns all squares that belong to the word (horizontal or vertical,
-        depending on the given orientation) which is the square on the i-th row
-        and j-th column part of. Returns None if the square is not a letter.
-        Return value comes in two possible variants: hashable and not hashable.
-        Hashable variant can be used as dictionary key, which is needed in the
-        generalized repetiton heuristic. Not hashable variant cannot be used as
-        such, but provides direct changes to the grid through the word object
-        since it is mutable. Since the hashable variant is used more often and
-        it is more optimized for read-only operations, this is used as a default
-        value.
+            self._loadFromLines(f.read().split())
+
+################################################################################
+
+    def _parseClue(self, token):
+        """
+        Returns orientation and number of one clue of a clue square token
+        (like V12 or H), with 0 for no clue. Returns None for the orientation
+        if the clue cannot be read.
         """
 
-        try:
-            while isinstance(self.grid[i][j], list) \
-              and not isinstance(self.grid[i][j], dict):
+        if self.VERTICAL in token:
+            orientation = self.VERTICAL
+        elif self.HORIZONTAL in token:
+            orientation = self.HORIZONTAL
+        else:
+            # TODO: error handling
+            return None, 0
 
-                if orientation == self.HORIZONTAL:
-                    # go to the left in  row until finding a clue
-                    j -= 1
-                if orientation == self.VERTICAL:
-                    # go up in the column until finding a clue
-                    i -= 1
+        try:
+            clue = int(token.lstrip(orientation))
+        except ValueError:
+            return orientation, 0
+        # no word can sum up to more than 45, a clue too big to be kept is
+        # as impossible as that
+        return orientation, min(clue, 0xFFFF)
 
-            word = []
-            while True:
+################################################################################
 
-                if orientation == self.HORIZONTAL:
-                    # go to the right in the row until going through the whole word
-                    j += 1
-                if orientation == self.VERTICAL:
-                    # go down in the column until going through the whole word
-                    i += 1
+    def _loadFromLines(self, lines):
+        """
+        Loads puzzle model from the rows of the text format. A letter can also
+        be given as its number, as written by toText() for solved letters.
+        """
 
-                if i == self.height or j == self.width \
-                  or not isinstance(self.grid[i][j], list):
-                    break
+        # masks of letters given in the rows, by their indexes
+        given = {}
+        kinds = bytearray()
+        horizontalClues = array('H')
+        verticalClues = array('H')
+        width = None
+        height = 0
+
+        for line in lines:
+            tokens = line.split(self.TOKENS_DELIMITER)
+
+            for token in tokens:
+                horizontalClue = 0
+                verticalClue = 0
+
+                if token == self.EMPTY:
+                    kinds.append(self.FILLER_SQUARE)
+                elif token == self.LETTER:
+                    kinds.append(self.LETTER_SQUARE)
+                elif token.isdigit() and 1 <= int(token) <= 9:
+                    given[len(kinds)] = NUMBER_BITS[int(token) - 1]
+                    kinds.append(self.LETTER_SQUARE)
                 else:
-                    if hashable:
-                        word.append(tuple(self.grid[i][j]))
-                    else:
-                        word.append(self.grid[i][j])
+                    clueTokens = token.split(self.CLUES_DELIMITER)
+                    if len(clueTokens) != 2:
+                        # TODO: error handling
+                        pass
+
+                    for clueToken in clueTokens[:2]:
+                        orientation, clue = self._parseClue(clueToken)
+                        if orientation == self.HORIZONTAL:
+                            horizontalClue = clue
+                        elif orientation == self.VERTICAL:
+                            verticalClue = clue
+                    kinds.append(self.CLUE_SQUARE)
+                horizontalClues.append(horizontalClue)
+                verticalClues.append(verticalClue)
+
+            if width is None:
+                width = len(tokens)
+            elif len(tokens) != width:
+                # TODO: error handling
+                pass
+            height += 1
+
+        self._loadFromArrays(width or 0, height, kinds, horizontalClues,
+                             verticalClues, given)
 
-            if hashable:
-                return tuple(word)
-            else:
-                return word
+################################################################################
 
-        except TypeError:
-            return None
+    def _loadFromArrays(self, width, height, kinds, horizontalClues,
+                        verticalClues, given):
+        """
+        Loads puzzle model from the arrays of kinds of squares and clues and
+        masks of given letters by their indexes.
+        """
+
+        self.width = width
+        self.height = height
+        self._kinds = kinds
+        self._horizontalClues = horizontalClues
+        self._verticalClues = verticalClues
+
+        # every letter starts with all the numbers possible, other squares
+        # have no possible numbers at all
+        self._domains = array('H', (ALL_NUMBERS if kind == self.LETTER_SQUARE
+                                    else 0 for kind in kinds))
+        for index, mask in given.items():
+            self._domains[index] = mask
+        self._buildRunIndex()
 
 ################################################################################
 
-    def _wordDuplicateLetters(self, i, j, orientation):
+    @property
+    def grid(self):
         """
-        Returns tuple of duplicate squares of the word (horizontal or vertical,
-        depending on the given orientation) which is the square in the i-th row
-        and j-th column part of. One duplicate square is also a tuple which
-        consists of two tuples. First are possible numbers in the duplicate
-        square and second are indexes of the square in the word (not in the
-        model grid).
+        Returns the puzzle as rows of squares: None for a filler, a dictionary
+        of horizontal and vertical clues for a clue and a list of possible
+        numbers for a letter. It is built from the arrays of the model on
+        every access, so it is meant for reading only.
         """
 
-        duplicates = defaultdict(list)
+        return [[list(NUMBERS[self._domains[i * self.width + j]])
+                 if self._kinds[i * self.width + j] == self.LETTER_SQUARE
+                 else self.square(i, j)
+                 for j in range(self.width)]
+                for i in range(self.height)]
 
-        for index, item in enumerate(self._word(i, j, orientation)):
-            duplicates[item].append(index)
+################################################################################
 
-        return tuple((key, tuple(indexes)) for key, indexes in duplicates.items())
+    def kind(self, i, j):
+        """
+        Returns kind of the square in the i-th row and j-th column:
+        FILLER_SQUARE, LETTER_SQUARE or CLUE_SQUARE.
+        """
+
+        return self._kinds[i * self.width + j]
 
 ################################################################################
 
-    def _wordClue(self, i, j, orientation):
+    def clues(self, i, j):
         """
-        Returns clue for the word (horizontal or vertical, depending on the
-        given orientation) which is the square in the i-th row and the j-th
-        column part of. Returns None if the square is not a letter.
+        Returns horizontal and vertical clue of the square in the i-th row and
+        j-th column, None for no clue (or a square which is not a clue).
         """
 
-        try:
-            while isinstance(self.grid[i][j], list) \
-              and not isinstance(self.grid[i][j], dict):
-
-                if orientation == self.HORIZONTAL:
-                    # go to the left in the row until finding a clue
-                    j -= 1
-                if orientation == self.VERTICAL:
-                    # go up in the column until finding a clue
-                    i -= 1
-
-            if orientation == self.HORIZONTAL:
-                return int((self.grid[i][j])[self.HORIZONTAL])
-            if orientation == self.VERTICAL:
-                return int((self.grid[i][j])[self.VERTICAL])
-
-        except TypeError:
+        index = i * self.width + j
+        return self._horizontalClues[index] or None, \
+            self._verticalClues[index] or None
+
+################################################################################
+
+    def square(self, i, j):
+        """
+        Returns the square in the i-th row and j-th column without building the
+        whole grid: None for a filler, a dictionary of horizontal and vertical
+        clues for a clue and LETTER for a letter. The dictionary is made on
+        every call, kind() and clues() read the arrays without it.
+        """
+
+        kind = self._kinds[i * self.width + j]
+
+        if kind == self.LETTER_SQUARE:
+            return self.LETTER
+        elif kind == self.CLUE_SQUARE:
+            horizontal, vertical = self.clues(i, j)
+            return {self.HORIZONTAL: horizontal, self.VERTICAL: vertical}
+        else:
             return None
 
 ################################################################################
 
-    def _isWordSolved(self, i, j, orientation):
+    def candidates(self, i, j):
         """
-        Returns True if the word (horizontal or vertical, depending on the given
-        orientation) which is the square in the i-th row and the j-th column
-        part of is already solved. Returns False otherwise.
+        Returns tuple of possible numbers of the letter in the i-th row and
+        j-th column in ascending order.
         """
 
-        return all(len(square) == 1 for square in self._word(i, j, orientation))
+        return NUMBERS[self._domains[i * self.width + j]]
 
 ################################################################################
 
-    def _cheatSheet(self, length, clue):
+    def toText(self):
         """
-        Returns list of all possible solutions for a word with given length and
-        clue. It is computed with simple combinations rather than hard-coding
-        the cheat sheet.
+        Returns the puzzle in the same text format it was loaded from, except
+        that solved letters are written as their numbers.
         """
 
-        return tuple(combination for combination in combinations([number for number in range(1, 10)], length)
-                     if sum(combination) == clue)
+        rows = []
+
+        for i in range(self.height):
+            tokens = []
+
+            for index in range(i * self.width, (i + 1) * self.width):
+                kind = self._kinds[index]
+
+                if kind == self.FILLER_SQUARE:
+                    tokens.append(self.EMPTY)
+                elif kind == self.CLUE_SQUARE:
+                    horizontal = self._horizontalClues[index]
+                    vertical = self._verticalClues[index]
+                    tokens.append(self.CLUES_DELIMITER.join((
+                        self.VERTICAL + (str(vertical) if vertical else ''),
+                        self.HORIZONTAL + (str(horizontal) if horizontal
+                                           else ''))))
+                else:
+                    mask = self._domains[index]
+                    tokens.append(str(NUMBERS[mask][0]) if isSingleton(mask)
+                                  else self.LETTER)
+            rows.append(self.TOKENS_DELIMITER.join(tokens))
+
+        return '\n'.join(rows) + '\n'
 
 ################################################################################
 
-    def _wordSolutions(self, i, j, orientation):
+    def snapshot(self):
         """
-        It returns all possible combinations that are solutions for the word
-        (horizontal or vertical, depending on the given orientation) which is
-        the square in the i-th row and the j-th column part of.
+        Returns a copy of possible numbers of all letters, which can be later
+        given to restore() to bring the puzzle back to this state.
         """
 
-        clue = self._wordClue(i, j, orientation)
-        word = self._word(i, j, orientation)
-        # get all combinations of possible numbers from letters, including those
-        # with repeating numbers; exclude the ones where some numbers are more
-        # than once or the ones which summation is not equal to the clue of the
-        # word
-        return tuple(combination for combination in tuple(product(*word))
-                     if len(set(combination)) == len(combination) \
-                       and sum(combination) == clue)
+        return array('H', self._domains)
 
 ################################################################################
 
-    def isSolved(self):
+    def restore(self, snapshot):
         """
-        Returns True if the puzzle is solved, False otherwise.
+        Brings possible numbers of all letters back to the state returned by
+        snapshot().
         """
 
-        for i in range(self.height):
+        if len(self._observers) > 0:
 
-            for j in range(self.width):
-                square = self.grid[i][j]
+            for index, (old, new) in enumerate(zip(self._domains, snapshot)):
 
-                if isinstance(square, list) and len(square) > 1:
-                    return False
+                if old != new:
+                    self._domains[index] = new
+                    self._notify(index, old, new)
+        else:
+            self._domains[:] = snapshot
+
+################################################################################
+
+    def restoreLetters(self, changes):
+        """
+        Sets possible numbers of the given letters, changes being (index, mask)
+        pairs, index being i * width + j. Unlike restore(), it takes time of
+        the changes only, not of the whole puzzle. Observers see the changes
+        as usual.
+        """
+
+        for index, mask in changes:
+            old = self._domains[index]
+
+            if old != mask:
+                self._domains[index] = mask
+                if len(self._observers) > 0:
+                    self._notify(index, old, mask)
+
+################################################################################
+
+    def addObserver(self, observer):
+        """
+        Adds a function to be called on every change of possible numbers of a
+        letter, with the letter index (i * width + j), its previous mask and its
+        new mask. Changes taken back by the search are reported too.
+        """
+
+        self._observers.append(observer)
+
+################################################################################
+
+    def removeObserver(self, observer):
+        """
+        Removes a function added by addObserver().
+        """
+
+        self._observers.remove(observer)
+
+################################################################################
+
+    def _notify(self, index, oldMask, newMask):
+        """
+        Calls all the observers about a change of possible numbers.
+        """
+
+        for observer in self._observers:
+            observer(index, oldMask, newMask)
+
+################################################################################
+
+    def enableInstrumentation(self, observer=None):
+        """
+        Starts counting calls, excluded numbers and time of every rule and
+        rounds of the propagation. Returns the Instrumentation with the
+        counters. Without it, the only cost left is a check of an empty
+        observers list on every change.
+        """
+
+        from src.instrumentation import Instrumentation
+
+        self.disableInstrumentation()
+        instrumentation = Instrumentation(observer)
+        instrumentation.attach(self)
+        return instrumentation
+
+################################################################################
+
+    def disableInstrumentation(self):
+        """
+        Stops counting started by enableInstrumentation().
+        """
+
+        if self.instrumentation is not None:
+            self.instrumentation.detach(self)
+
+################################################################################
+
+    def trackChanges(self):
+        """
+        Starts collecting letters whose possible numbers change, so that views
+        of the model can update only those letters (see takeChanges()).
+        """
+
+        if self._changed is None:
+            self._changed = set()
+            self.addObserver(self._letterChanged)
+
+################################################################################
+
+    def _letterChanged(self, index, oldMask, newMask):
+        """
+        Observer collecting changed letters for takeChanges().
+        """
+
+        self._changed.add(index)
+
+################################################################################
+
+    def takeChanges(self):
+        """
+        Returns letters changed since the previous call (or since
+        trackChanges()) as a list of (index, possible numbers) pairs, index
+        being i * width + j, and starts collecting anew. A letter changed
+        several times is returned once, with its current possible numbers;
+        letters changed and then changed back are returned as well.
+        """
+
+        if self._changed is None:
+            return []
+
+        changes = [(index, self._domains[index])
+                   for index in sorted(self._changed)]
+        self._changed = set()
+        return changes
+
+################################################################################
+
+    def statistics(self):
+        """
+        Returns dictionary with the counters of the instrumentation (if it is
+        enabled), of the last search and of the word support cache (which is
+        shared by the whole process, see supportCacheStatistics()).
+        """
+
+        statistics = {} if self.instrumentation is None \
+            else self.instrumentation.summary()
+        statistics['search'] = {
+            'nodes': self.searchNodes,
+            'backtracks': self.searchBacktracks,
+            'maxDepth': self.searchMaxDepth
+        }
+        statistics['supportCache'] = supportCacheStatistics()
+        return statistics
+
+################################################################################
+
+    def _buildRunIndex(self):
+        """
+        Builds the run index of the loaded puzzle. Every word is stored once in
+        self.runs and every letter gets a pointer to its horizontal and
+        vertical run, so nothing has to walk the grid to find the clue or the
+        other letters of a word later. All of it is kept in flat arrays, with
+        no object for a word or a letter.
+        """
+
+        runs = Runs(self.width)
+        kinds = self._kinds
+        width = self.width
+        size = len(kinds)
+        horizontalRuns = array('i', (-1,)) * size
+        verticalRuns = array('i', (-1,)) * size
+        letters = array('i')
+        index = kinds.find(self.CLUE_SQUARE)
+
+        while index >= 0:
+            # a horizontal word ends with the row, a vertical one with the
+            # grid
+            for orientation, clues, step, end, letterRuns, otherRuns in (
+                    (self.HORIZONTAL, self._horizontalClues, 1,
+                     (index // width + 1) * width, horizontalRuns,
+                     verticalRuns),
+                    (self.VERTICAL, self._verticalClues, width, size,
+                     verticalRuns, horizontalRuns)):
+                # go to the right in the row or down in the column until
+                # going through the whole word
+                last = index + step
+                while last < end and kinds[last] == self.LETTER_SQUARE:
+                    last += step
+
+                if last > index + step and clues[index] != 0:
+                    runIndex = len(runs)
+                    for letter in range(index + step, last, step):
+                        if letterRuns[letter] < 0 and otherRuns[letter] < 0:
+                            letters.append(letter)
+                        letterRuns[letter] = runIndex
+                    runs.append(orientation, clues[index], index + step,
+                                (last - index) // step - 1)
+
+            index = kinds.find(self.CLUE_SQUARE, index + 1)
+
+        self.runs = runs
+        self._horizontalRuns = horizontalRuns
+        self._verticalRuns = verticalRuns
+        self._letters = letters
+
+################################################################################
+
+    def _letterRuns(self, index):
+        """
+        Returns indexes of the words (one or two) the letter with given index
+        is part of.
+        """
+
+        horizontal = self._horizontalRuns[index]
+        vertical = self._verticalRuns[index]
+
+        if horizontal < 0:
+            return (vertical,)
+        elif vertical < 0:
+            return (horizontal,)
+        else:
+            return horizontal, vertical
+
+################################################################################
+
+    def _setDomain(self, index, mask):
+        """
+        Sets possible numbers of the letter with given index into the domains
+        array. Every change of possible numbers goes through here, so both
+        words of the letter can be queued again if the propagation is running
+        and the previous value can be put on the trail if the search is running.
+        """
+
+        oldMask = self._domains[index]
+        if self._trail is not None:
+            self._trail.append((index, oldMask))
+        self._domains[index] = mask
+        if mask == 0:
+            self._failed = True
+        if len(self._observers) > 0:
+            self._notify(index, oldMask, mask)
+
+        if self._queue is not None:
+
+            for runIndex in (self._horizontalRuns[index],
+                             self._verticalRuns[index]):
+
+                if runIndex >= 0 and not self._queued[runIndex]:
+                    self._queued[runIndex] = 1
+                    self._queue.append(runIndex)
+
+################################################################################
+
+    def _word(self, run):
+        """
+        Returns possible numbers masks of all letters of the given word. The
+        masks are plain integers, so the word can be used as a dictionary key,
+        which is needed in the generalized repetition heuristic.
+        """
+
+        return tuple(self._domains[index] for index in run.indexes)
+
+################################################################################
+
+    def _wordDuplicateLetters(self, run):
+        """
+        Returns tuple of duplicate squares of the given word. One duplicate
+        square is also a tuple which consists of two tuples. First are possible
+        numbers in the duplicate square (as a mask) and second are indexes of
+        the square in the word (not in the model grid).
+        """
+
+        duplicates = defaultdict(list)
+
+        for index, item in enumerate(self._word(run)):
+            duplicates[item].append(index)
+
+        return tuple((key, tuple(indexes)) for key, indexes in duplicates.items())
+
+################################################################################
+
+    def _isWordSolved(self, run):
+        """
+        Returns True if the given word is already solved. Returns False
+        otherwise.
+        """
+
+        return all(isSingleton(square) for square in self._word(run))
+
+################################################################################
+
+    def _isWordValid(self, run):
+        """
+        Returns True if every letter of the word has one number, the numbers
+        are all different and they sum up to the clue. The rules may leave
+        one number in every letter without checking the word as a whole (not
+        all of them check sums or duplicates), so this is what tells a
+        solution apart.
+        """
+
+        used = 0
+
+        for index in run.indexes:
+            mask = self._domains[index]
+
+            if not isSingleton(mask) or mask & used:
+                return False
+            used |= mask
+
+        return sum(NUMBERS[used]) == run.clue
+
+################################################################################
+
+    def _areWordsValid(self, letters=None):
+        """
+        Returns True if all the words with some of the given letters (all the
+        words if None) are valid, see _isWordValid().
+        """
+
+        if letters is None:
+            runIndexes = range(len(self.runs))
+        else:
+            runIndexes = {runIndex for index in letters
+                          for runIndex in self._letterRuns(index)}
+
+        return all(self._isWordValid(self.runs[runIndex])
+                   for runIndex in runIndexes)
+
+################################################################################
+
+    def _isComplete(self):
+        """
+        Returns True if every letter has exactly one possible number, whether
+        the words are valid or not.
+        """
+
+        for index in self._letters:
+
+            if not isSingleton(self._domains[index]):
+                return False
 
         return True
 
 ################################################################################
 
-    def _applyRawHeuristicRule(self, i, j, orientation):
+    def isSolved(self):
+        """
+        Returns True if the puzzle is solved: every letter has one number and
+        every word sums up to its clue with no number repeated. Returns False
+        otherwise.
+        """
+
+        return self._isComplete() and self._areWordsValid()
+
+################################################################################
+
+    def _applyRawHeuristicRule(self, run):
         """
         It applies raw heuristic rule for possible numbers exclusion on the
-        square in the i-th row and j-th column.
+        letters of the given word.
         It excludes those possible numbers which are not part of any solution
         taken from the cheat sheet.
+        It returns True if any changes were made. If running this method leaves
+        the model unchanged, it returns False.
         """
 
-        # get params of the word which is the square in the i-th row and j-th
-        # column part of
-        wordLength = len(self._word(i, j, orientation))
-        wordClue = self._wordClue(i, j, orientation)
-        # now we can peek to cheat sheet to see every possible solution of the
-        # word with given lengths and clues
-        solutions = self._cheatSheet(wordLength, wordClue)
-        # get all numbers which appear in at least one possible solution for
-        # the word
-        possibleNumbers = set().union(*solutions)
-        # now we can exclude numbers which does not appear in any of all the
-        # possible solutions
-        self.grid[i][j] = [number for number in self.grid[i][j]
-                           if number in possibleNumbers]
+        # now we can peek to cheat sheet to see numbers which appear in at
+        # least one possible solution of the word with given length and clue
+        possibleNumbers = crossSum(len(run.indexes), run.clue).possible
+        modelChanged = False
+
+        for index in run.indexes:
+            square = self._domains[index]
+
+            # now we can exclude numbers which does not appear in any of all
+            # the possible solutions
+            if square & ~possibleNumbers:
+                self._setDomain(index, square & possibleNumbers)
+                modelChanged = True
+
+        return modelChanged
 
 ################################################################################
 
-    def _applySolutionsRule(self, i, j, orientation):
+    def _applySolutionsRule(self, run):
         """
         It applies possible solutions rule for possible numbers exclusion on the
-        whole word (horizontal or vertical, depending on the given orientation)
-        which is the square in the i-th row and j-th column part of.
-        It gets all possible combinations of numbers which are solutions for the
-        word and excludes numbers which are not part of it.
+        given word.
+        It gets numbers which are part of at least one solution of the word on
+        every position and excludes the other numbers.
         It returns True if any changes were made. If running this method leaves
         the model unchanged, it returns False.
         """
 
-        word = self._word(i, j, orientation, hashable=False)
-        combs = self._wordSolutions(i, j, orientation)
+        support = wordSupport(run.clue, self._word(run))
         modelChanged = False
 
-        for i in range(len(word)):
-            square = word[i]
+        for index, supported in zip(run.indexes, support):
+            square = self._domains[index]
+
+            if square & ~supported:
+                self._setDomain(index, square & supported)
+                modelChanged = True
+
+        return modelChanged
+
+################################################################################
+
+    def _applyLimitsRule(self, run):
+        """
+        It applies sum limits on the given word.
+        Other letters of the word add up to at least the smallest and at most
+        the largest sum of different numbers possible in them, so every letter
+        can only take numbers between the clue minus the largest and the clue
+        minus the smallest sum. Every letter is in two words, so it ends up
+        limited from both of them.
+        It returns True if any changes were made. If running this method leaves
+        the model unchanged, it returns False.
+        """
 
-            for number in range(1, 10):
+        word = self._word(run)
+        others = len(word) - 1
+        tails = _tails(word)
+        head = 0
+        modelChanged = False
+
+        for position, index in enumerate(run.indexes):
+            # possible numbers of all the other letters of the word
+            rest = head | tails[position + 1]
+            head |= word[position]
+            low = max(run.clue - MAX_SUMS[others][rest], 1)
+            high = min(run.clue - MIN_SUMS[others][rest], 9)
+            limits = RANGE_MASKS[low][high] if low <= high else 0
 
-                if number in square and number not in tuple(comb[i] for comb in combs):
-                    square.remove(number)
-                    modelChanged = True
+            if word[position] & ~limits:
+                self._setDomain(index, word[position] & limits)
+                modelChanged = True
 
         return modelChanged
 
 ################################################################################
 
-    def _applyDuplicatesRule(self, i, j, orientation):
+    def _combinationBounds(self, run):
+        """
+        Returns numbers which are in at least one and numbers which are in all
+        of the number combinations of the cheat sheet still usable for the
+        word: all numbers of a usable combination are possible somewhere in
+        the word and every letter can take one of them.
+        """
+
+        word = self._word(run)
+        union = 0
+        for square in word:
+            union |= square
+        possible = 0
+        required = ALL_NUMBERS
+
+        for combination in crossSum(len(word), run.clue).combinations:
+            if combination & ~union == 0 \
+                    and all(square & combination for square in word):
+                possible |= combination
+                required &= combination
+
+        return possible, required & possible
+
+################################################################################
+
+    def _applyRequiredNumbersRule(self, run):
+        """
+        It applies required numbers rule on the given word.
+        Unlike the raw heuristic, it takes only number combinations still
+        usable with the possible numbers of the letters and excludes numbers
+        which are in none of them.
+        It returns True if any changes were made. If running this method leaves
+        the model unchanged, it returns False.
+        """
+
+        possible = self._combinationBounds(run)[0]
+        modelChanged = False
+
+        for index in run.indexes:
+            square = self._domains[index]
+
+            if square & ~possible:
+                self._setDomain(index, square & possible)
+                modelChanged = True
+
+        return modelChanged
+
+################################################################################
+
+    def _applyHiddenSinglesRule(self, run):
+        """
+        It applies hidden singles rule on the given word.
+        A number which is in all the usable number combinations must be used
+        in the word; if only one letter can take it, the letter is solved.
+        It returns True if any changes were made. If running this method leaves
+        the model unchanged, it returns False.
+        """
+
+        required = self._combinationBounds(run)[1]
+        modelChanged = False
+
+        for number in NUMBERS[required]:
+            bit = NUMBER_BITS[number - 1]
+            letters = [index for index in run.indexes
+                       if self._domains[index] & bit]
+
+            if len(letters) == 1 and self._domains[letters[0]] != bit:
+                self._setDomain(letters[0], bit)
+                modelChanged = True
+
+        return modelChanged
+
+################################################################################
+
+    def _applyHiddenPairsRule(self, run):
+        """
+        It applies hidden pairs rule on the given word.
+        If two numbers which must be used in the word can both be taken only
+        by the same two letters, those letters cannot take any other numbers.
+        It returns True if any changes were made. If running this method leaves
+        the model unchanged, it returns False.
+        """
+
+        required = NUMBERS[self._combinationBounds(run)[1]]
+        modelChanged = False
+        # letters which can take the number, by the required numbers
+        letters = {number: tuple(index for index in run.indexes
+                                 if self._domains[index]
+                                 & NUMBER_BITS[number - 1])
+                   for number in required}
+
+        for first, second in combinations(required, 2):
+            if len(letters[first]) == 2 and letters[first] == letters[second]:
+                pair = NUMBER_BITS[first - 1] | NUMBER_BITS[second - 1]
+
+                for index in letters[first]:
+                    square = self._domains[index]
+                    if square & ~pair:
+                        self._setDomain(index, square & pair)
+                        modelChanged = True
+
+        return modelChanged
+
+################################################################################
+
+    def _applyDuplicatesRule(self, run):
         """
         It applies generalized duplicates rule for possible numbers exclusion on
-        the whole word (horizontal or vertical, depending on the given
-        orientation) which is the square in the i-th row and j-th column part
-        of.
+        the given word.
         The rule states that if there are N same letters in the word with N
         possible numbers (N >= 1), we can exclude those numbers from other
         letters in the word.
@@ -325,25 +1233,71 @@ class Model(object):
         the model unchanged, it returns False.
         """
 
-        duplicates = self._wordDuplicateLetters(i, j, orientation)
-        word = self._word(i, j, orientation, hashable=False)
+        duplicates = self._wordDuplicateLetters(run)
         modelChanged = False
 
-        for i in range(len(word)):
-            square = word[i]
+        for position, index in enumerate(run.indexes):
 
             # go through every duplicate letter in the word
             for duplicate in duplicates:
 
                 # if the numbers exclusion rule can be applied
-                if len(duplicate[0]) == len(duplicate[1]) and i not in duplicate[1]:
+                if POPCOUNT[duplicate[0]] == len(duplicate[1]) \
+                  and position not in duplicate[1]:
 
                     # apply the rule
-                    for number in duplicate[0]:
+                    square = self._domains[index]
+                    if square & duplicate[0]:
+                        self._setDomain(index, square & ~duplicate[0])
+                        modelChanged = True
+
+        return modelChanged
+
+################################################################################
+
+    def enableRule(self, rule, enabled=True):
+        """
+        Switches the rule with given name on or off in propagate(). Enabled
+        rules are applied to every word in the order of RULE_ORDER.
+        """
+
+        rules = set(self.rules)
+        if enabled:
+            rules.add(rule)
+        else:
+            rules.discard(rule)
+        self.rules = [rule for rule in self.RULE_ORDER if rule in rules]
+
+################################################################################
+
+    def _ruleFunction(self, rule):
+        """
+        Returns the method applying the rule with given name to a word, counted
+        by the instrumentation if it is enabled.
+        """
 
-                        if number in square:
-                            square.remove(number)
-                            modelChanged = True
+        apply = getattr(self, self.RULE_METHODS[rule])
+        if self.instrumentation is not None:
+            apply = self.instrumentation.wrapRule(rule, apply)
+        return apply
+
+################################################################################
+
+    def _applyRule(self, rule):
+        """
+        Applies the rule once to every word which is not solved yet.
+        It returns True if any changes were made. If running the rule leaves
+        the model unchanged, it returns False.
+        """
+
+        apply = self._ruleFunction(rule)
+        modelChanged = False
+
+        for run in self.runs:
+
+            if not self._isWordSolved(run):
+                result = apply(run)
+                if result == True: modelChanged = True
 
         return modelChanged
 
@@ -357,13 +1311,7 @@ class Model(object):
         first run since it works only with individual squares in no context.
         """
 
-        for i in range(self.height):
-
-            for j in range(self.width):
-
-                if isinstance(self.grid[i][j], list):
-                    self._applyRawHeuristicRule(i, j, self.HORIZONTAL)
-                    self._applyRawHeuristicRule(i, j, self.VERTICAL)
+        self._applyRule(self.RAW_HEURISTIC)
 
 ################################################################################
 
@@ -379,23 +1327,7 @@ class Model(object):
         leaves the model unchanged, it returns False.
         """
 
-        modelChanged = False
-
-        for i in range(self.height):
-
-            for j in range(self.width):
-
-                if isinstance(self.grid[i][j], list):
-
-                    if not self._isWordSolved(i, j, self.HORIZONTAL):
-                        result = self._applySolutionsRule(i, j, self.HORIZONTAL)
-                        if result == True: modelChanged = True
-
-                    if not self._isWordSolved(i, j, self.VERTICAL):
-                        result = self._applySolutionsRule(i, j, self.VERTICAL)
-                        if result == True: modelChanged = True
-
-        return modelChanged
+        return self._applyRule(self.CONTEXT_SOLUTIONS)
 
 ################################################################################
 
@@ -408,34 +1340,525 @@ class Model(object):
         leaves the model unchanged, it returns False.
         """
 
+        return self._applyRule(self.GENERALIZED_REPETITION)
+
+################################################################################
+
+    def propagate(self, runIndexes=None):
+        """
+        Applies all the rules in self.rules until none of them can exclude any
+        more numbers. Words waiting for the rules are kept in a queue (all of
+        them at the beginning, or only those with given indexes into self.runs);
+        whenever possible numbers of a letter change, only its two words are
+        queued again, so the work done is proportional to the changes rather
+        than to the size of the puzzle. It stops as soon as some letter is left
+        with no possible numbers or some word is left with one number in every
+        letter, but not summing up to its clue or with a number repeated.
+        Words queued before the current round started make up a round; rounds
+        are recorded by the instrumentation, if it is enabled, except those
+        inside the search.
+        When solve() is cancelled, the propagation stops early; possible
+        numbers left are still correct, just not all the rules were applied.
+        It returns True if any changes were made. If the propagation leaves the
+        model unchanged, it returns False.
+        """
+
+        rules = [self._ruleFunction(rule) for rule in self.rules]
+        # the solutions rule takes every number out of a word which cannot sum
+        # up to its clue with different numbers, the others do not
+        checkWords = self.CONTEXT_SOLUTIONS not in self.rules
+        instrumentation = self.instrumentation \
+            if self._trail is None else None
+        if runIndexes is None:
+            runIndexes = range(len(self.runs))
+        self._queue = deque()
+        self._queued = bytearray(len(self.runs))
+        self._failed = False
         modelChanged = False
 
-        for i in range(self.height):
+        for runIndex in runIndexes:
 
-            for j in range(self.width):
+            if not self._queued[runIndex]:
+                self._queued[runIndex] = 1
+                self._queue.append(runIndex)
 
-                if isinstance(self.grid[i][j], list):
+        # words left to the end of the current round and whether the round
+        # is being recorded by the instrumentation
+        roundLeft = len(self._queue)
+        roundRuns = roundLeft
+        roundOpen = instrumentation is not None and roundRuns > 0
+        if roundOpen:
+            instrumentation.startRound()
 
-                    if not self._isWordSolved(i, j, self.HORIZONTAL):
-                        result = self._applyDuplicatesRule(i, j, self.HORIZONTAL)
-                        if result == True: modelChanged = True
+        try:
+            while len(self._queue) > 0 and not self._failed:
+                runIndex = self._queue.popleft()
+                self._queued[runIndex] = 0
+                run = self.runs[runIndex]
+
+                # solved words are not skipped here: a guess made by the search
+                # can solve a word wrongly and the solutions rule finds it out
+                for apply in rules:
+                    result = apply(run)
+                    if result == True: modelChanged = True
+
+                # without the solutions rule, nothing checks sums and repeated
+                # numbers of a whole word, so a word left with one number in
+                # every letter is checked here; a broken one fails the
+                # propagation like a letter with no numbers
+                if checkWords and not self._failed \
+                        and self._isWordSolved(run) \
+                        and not self._isWordValid(run):
+                    self._failed = True
+
+                self.propagationSteps += 1
+                roundLeft -= 1
+                if self._cancel is not None \
+                        and self.propagationSteps % self.CANCEL_STEPS == 0 \
+                        and self._isCancelled():
+                    break
 
-                    if not self._isWordSolved(i, j, self.VERTICAL):
-                        result = self._applyDuplicatesRule(i, j, self.VERTICAL)
-                        if result == True: modelChanged = True
+                if roundLeft == 0:
+                    if roundOpen:
+                        instrumentation.finishRound(roundRuns)
+                    roundLeft = len(self._queue)
+                    roundRuns = roundLeft
+                    roundOpen = instrumentation is not None \
+                        and roundRuns > 0 and not self._failed
+                    if roundOpen:
+                        instrumentation.startRound()
+        finally:
+            # a round cut short by a failure or cancelling is recorded with
+            # the words it got to
+            if roundOpen:
+                instrumentation.finishRound(roundRuns - roundLeft)
+            self._queue = None
+            self._queued = None
 
         return modelChanged
 
 ################################################################################
 
-    def solve(self):
+    def _mostConstrainedLetter(self, letters=None):
+        """
+        Returns index of the unsolved letter with the least possible numbers,
+        or None if all the letters are solved. Only the given letters are
+        looked at, or all of them if None.
+        """
+
+        best = None
+        bestCount = 10
+
+        for index in self._letters if letters is None else letters:
+            count = POPCOUNT[self._domains[index]]
+
+            if 1 < count < bestCount:
+                best = index
+                bestCount = count
+                if count == 2:
+                    break
+
+        return best
+
+################################################################################
+
+    def _undo(self, mark):
+        """
+        Takes changes back from the trail until it has the given length.
+        """
+
+        trail = self._trail
+        while len(trail) > mark:
+            index, mask = trail.pop()
+            if len(self._observers) > 0:
+                self._notify(index, self._domains[index], mask)
+            self._domains[index] = mask
+        self._failed = False
+
+################################################################################
+
+    def _isCancelled(self):
+        """
+        Asks the function set by solve() whether it should stop. Once it says
+        so, it is not asked again.
+        """
+
+        if not self._cancelled and self._cancel is not None:
+            self._cancelled = bool(self._cancel())
+        return self._cancelled
+
+################################################################################
+
+    def _shouldStop(self, cancel, deadline, maxSteps, maxNodes):
+        """
+        Tells whether solve() should stop: when cancel() was called or the
+        cancel function says so (the reason is CANCELLED), or when the time
+        given by deadline (of perf_counter()) is up or one of the budgets of
+        propagation steps and search nodes is used up (EXHAUSTED).
+        """
+
+        if self._cancelRequested or (cancel is not None and cancel()):
+            self._stopStatus = self.CANCELLED
+        elif (deadline is not None and perf_counter() > deadline) \
+                or (maxSteps is not None
+                    and self.propagationSteps >= maxSteps) \
+                or (maxNodes is not None and self.searchNodes >= maxNodes):
+            self._stopStatus = self.EXHAUSTED
+        else:
+            return False
+        return True
+
+################################################################################
+
+    def cancel(self):
+        """
+        Asks solve() or countSolutions() running in another thread to stop as
+        soon as possible. When nothing is running yet, the next one stops
+        right away, so a cancel() made while a worker is still starting is not
+        lost.
+        """
+
+        self._cancelRequested = True
+
+################################################################################
+
+    @property
+    def stopStatus(self):
+        """
+        Why the last solve() or countSolutions() stopped before it finished:
+        CANCELLED or EXHAUSTED (see solve()), None if it was not stopped.
+        """
+
+        return self._stopStatus if self._cancelled else None
+
+################################################################################
+
+    def _search(self, letters=None):
+        """
+        Searches for a solution by trial and error once the heuristics cannot
+        make any more progress. It always guesses a number of the letter with
+        the least possible numbers and propagates the rules after every guess.
+        Wrong guesses are taken back from the trail of changed letters, so
+        nothing is copied and memory grows only with the changes on the current
+        path. Only the given letters are guessed (all of them if None), which
+        is enough for a component (see components()).
+        It returns True and leaves the solution in the model if there is one.
+        It returns False and leaves the model as it was otherwise, or when
+        solve() is cancelled.
+        """
+
+        # every level of the stack is a guessed letter: the trail length
+        # before the guess, its index and its numbers not tried yet
+        stack = []
+        self._trail = []
+
+        try:
+            while True:
+                if self._isCancelled():
+                    self._undo(0)
+                    return False
+
+                index = self._mostConstrainedLetter(letters)
+                if index is None:
+                    # every letter has one number, but the rules need not
+                    # have checked the words; a broken one is a failed guess
+                    if self._areWordsValid(letters):
+                        return True
+                else:
+                    stack.append([len(self._trail), index,
+                                  self._domains[index]])
+                    self.searchMaxDepth = max(self.searchMaxDepth, len(stack))
+
+                while True:
+                    if len(stack) == 0:
+                        return False
+
+                    mark, index, untried = stack[-1]
+                    self._undo(mark)
+                    if self._isCancelled():
+                        self._undo(0)
+                        return False
+
+                    if untried == 0:
+                        # every number of the letter failed, go one level up
+                        stack.pop()
+                        self.searchBacktracks += 1
+                        continue
+
+                    if untried != self._domains[index]:
+                        # numbers which failed already are excluded first, the
+                        # rules can often propagate that further
+                        self._setDomain(index, untried)
+                        self.propagate(self._letterRuns(index))
+
+                        if self._failed:
+                            stack[-1][2] = 0
+                            continue
+
+                    number = untried & -untried
+                    stack[-1][2] = untried & ~number
+                    self.searchNodes += 1
+                    self._setDomain(index, number)
+                    self.propagate(self._letterRuns(index))
+
+                    if not self._failed:
+                        break
+        finally:
+            self._trail = None
+
+################################################################################
+
+    def components(self):
+        """
+        Returns unsolved letters split into components: letters of a component
+        are linked to each other through words, but no word has unsolved
+        letters of two components. Solved letters are just numbers in the sums
+        of their words, so the rules and guesses in one component never touch
+        the others and every component can be solved on its own. Components
+        are tuples of letter indexes, the biggest first.
+        """
+
+        # union-find of unsolved letters
+        parents = {index: index for index in self._letters
+                   if POPCOUNT[self._domains[index]] > 1}
+
+        def find(index):
+            while parents[index] != index:
+                parents[index] = parents[parents[index]]
+                index = parents[index]
+            return index
+
+        for run in self.runs:
+            unsolved = [index for index in run.indexes if index in parents]
+
+            for index in unsolved[1:]:
+                parents[find(index)] = find(unsolved[0])
+
+        components = defaultdict(list)
+        for index in parents:
+            components[find(index)].append(index)
+        return sorted((tuple(component) for component in components.values()),
+                      key=len, reverse=True)
+
+################################################################################
+
+    def _searchComponents(self, workers=1):
+        """
+        Searches for a solution of every component separately, so the search
+        grows with the biggest component instead of with the product of all of
+        them. With more than one worker, components are solved in that many
+        processes at once (see src.parallelSearch). It returns True and leaves
+        the solution in the model if there is one. It returns False and leaves
+        the model as it was otherwise, or when solve() is cancelled.
+        """
+
+        components = self.components()
+        if workers > 1 and len(components) > 1:
+            from src.parallelSearch import solveComponents
+            return solveComponents(self, components, workers)
+
+        snapshot = self.snapshot()
+
+        for component in components:
+
+            if not self._search(component):
+                self.restore(snapshot)
+                return False
+
+        return True
+
+################################################################################
+
+    def solve(self, search=False, cancel=None, workers=1, timeout=None,
+              maxSteps=None, maxNodes=None):
         """
         It uses all three known heuristics to solve the puzzle automatically.
+        The raw heuristic is applied once, the other two are then propagated
+        until they make no more changes. If search is True and the puzzle is
+        still not solved, the rest is found by trial and error, one component
+        after another or in workers processes at once; search counters are
+        then in searchNodes, searchBacktracks and searchMaxDepth.
+        Solving stops as soon as possible (after at most CANCEL_STEPS words
+        or one search node), leaving the numbers excluded so far, when:
+        - cancel, a function called now and then from the thread running
+          solve(), returns True, or cancel() is called from another thread
+        - timeout seconds have passed since solve() started
+        - maxSteps words were propagated or maxNodes search nodes visited
+          (with more workers, nodes of the other processes are counted only
+          as their components are finished)
+        It returns SolveResult telling how it ended, how many letters and
+        possible numbers are left and what it took.
         """
 
-        self.rawHeuristic()
+        start = perf_counter()
+        deadline = None if timeout is None else start + timeout
+        self.propagationSteps = 0
+        self.searchNodes = 0
+        self.searchBacktracks = 0
+        self.searchMaxDepth = 0
+        self._cancel = partial(self._shouldStop, cancel, deadline, maxSteps,
+                               maxNodes)
+        self._cancelled = False
+        self._stopStatus = None
+        self._failed = False
+        found = True
+
+        try:
+            self.rawHeuristic()
+            # propagate() starts with no failure, a letter emptied by the raw
+            # heuristic (a clue no word can have) must not be forgotten
+            if not self._failed:
+                self.propagate()
+
+            if search and not self._failed and not self._cancelled \
+                    and not self._isComplete():
+                found = self._searchComponents(workers)
+        finally:
+            self._cancel = None
+            # a cancel() which came before solve() started stopped it, one
+            # which comes after it finished must not stop the next one
+            self._cancelRequested = False
+
+        if self._cancelled:
+            status = self._stopStatus
+        elif self._failed or not found:
+            status = self.UNSOLVABLE
+        elif self._isComplete():
+            status = self.SOLVED if self._areWordsValid() \
+                else self.UNSOLVABLE
+        else:
+            status = self.STALLED
+
+        unsolved = [self._domains[index] for index in self._letters
+                    if POPCOUNT[self._domains[index]] != 1]
+        return SolveResult(status, len(unsolved),
+                           sum(POPCOUNT[mask] for mask in unsolved),
+                           self.propagationSteps, self.searchNodes,
+                           perf_counter() - start)
+
+################################################################################
 
-        while self.contextSolutionsHeuristic() or self.generalizedRepetitionHeuristic():
-            pass
+    def _branch(self, snapshot, index, number):
+        """
+        Brings the model to the snapshot, sets the letter with given index to
+        the number mask and propagates the rules. Returns snapshot of the
+        result, or None if some letter was left with no possible numbers.
+        """
 
-################################################################################
\ No newline at end of file
+        self.restore(snapshot)
+        self._setDomain(index, number)
+        self.propagate(self._letterRuns(index))
+        return None if self._failed else self.snapshot()
+
+################################################################################
+
+    def _countSearch(self, limit):
+        """
+        Counts solutions by trial and error like _search(), but goes on after
+        a solution is found until all the guesses are tried or limit
+        solutions are found. Returns the number of solutions found and
+        snapshot of the first of them (None if there is none); the model is
+        left as it was.
+        """
+
+        # every level of the stack is a guessed letter: the trail length
+        # before the guess, its index and its numbers not tried yet
+        stack = []
+        self._trail = []
+        count = 0
+        first = None
+
+        try:
+            while True:
+                if self._isCancelled():
+                    break
+
+                index = self._mostConstrainedLetter()
+                if index is None:
+                    # a leaf with a broken word is not a solution, see
+                    # _search()
+                    if self._areWordsValid():
+                        count += 1
+                        if first is None:
+                            first = self.snapshot()
+                        if count >= limit:
+                            break
+                else:
+                    stack.append([len(self._trail), index, self._domains[index]])
+                    self.searchMaxDepth = max(self.searchMaxDepth, len(stack))
+
+                while len(stack) > 0:
+                    mark, index, untried = stack[-1]
+                    self._undo(mark)
+
+                    if untried == 0:
+                        # every number of the letter was tried, go one level up
+                        stack.pop()
+                        self.searchBacktracks += 1
+                        continue
+
+                    number = untried & -untried
+                    stack[-1][2] = untried & ~number
+                    self.searchNodes += 1
+                    self._setDomain(index, number)
+                    self.propagate(self._letterRuns(index))
+
+                    if not self._failed:
+                        break
+
+                if len(stack) == 0:
+                    break
+        finally:
+            self._undo(0)
+            self._trail = None
+
+        return count, first
+
+################################################################################
+
+    def countSolutions(self, limit=2, workers=1, cancel=None, timeout=None):
+        """
+        Counts solutions of the puzzle, but stops as soon as limit of them are
+        found, so countSolutions() == 1 tells the puzzle has exactly one
+        solution with the default limit. The heuristics are propagated first
+        like in solve(), the rest is searched. With more than one worker, the
+        first guesses are split into subtrees searched in that many processes
+        (see src.parallelSearch). The first solution found, if any, is left in
+        the model. cancel and timeout work as in solve(); a stopped count is
+        the number of solutions found so far and stopStatus tells why it
+        stopped.
+        """
+
+        self.propagationSteps = 0
+        self.searchNodes = 0
+        self.searchBacktracks = 0
+        self.searchMaxDepth = 0
+        deadline = None if timeout is None else perf_counter() + timeout
+        self._cancel = partial(self._shouldStop, cancel, deadline, None, None)
+        self._cancelled = False
+        self._stopStatus = None
+        self._failed = False
+
+        try:
+            self.rawHeuristic()
+            if not self._failed:
+                self.propagate()
+            if self._failed:
+                return 0
+            if self._isComplete():
+                return 1 if self._areWordsValid() else 0
+
+            if workers > 1:
+                from src.parallelSearch import countSolutions
+                count, first = countSolutions(self, limit, workers)
+            else:
+                count, first = self._countSearch(limit)
+        finally:
+            self._cancel = None
+            self._cancelRequested = False
+
+        if first is not None:
+            self.restore(first)
+        return count
+
+################################################################################
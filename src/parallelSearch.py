@@ -0,0 +1,200 @@
+__author__ = "Tofu Gang"
+
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+import multiprocessing
+from src.model import NUMBERS, NUMBER_BITS
+
+
+
+################################################################################
+
+# the search is split into this many subtrees per worker, so that workers
+# which got small subtrees can take more while others are still busy
+SUBTREES_PER_WORKER = 4
+# how often (in seconds) the waiting for workers checks whether it is
+# cancelled
+POLL_SECONDS = 0.1
+
+# the model and the stop flag of a worker process, set by _initWorker()
+_model = None
+_stop = None
+
+################################################################################
+
+def _initWorker(model, stop):
+    """
+    Keeps the model and the stop flag in the worker process, so that tasks
+    need to carry only possible numbers of their subtrees.
+    """
+
+    global _model, _stop
+    _model = model
+    _stop = stop
+
+################################################################################
+
+def _countSubtree(snapshot, limit):
+    """
+    Counts solutions of one subtree in a worker process. Returns the count,
+    snapshot of the first solution (or None) and number of search nodes.
+    """
+
+    _model.restore(snapshot)
+    _model.searchNodes = 0
+    _model._cancel = _stop.is_set
+    _model._cancelled = False
+    try:
+        count, first = _model._countSearch(limit)
+    finally:
+        _model._cancel = None
+    return count, first, _model.searchNodes
+
+################################################################################
+
+def splitSubtrees(model, count):
+    """
+    Splits the search of the propagated model into at least count subtrees
+    (if there are so many) by guessing all the numbers of the most
+    constrained letters, breadth first. Returns list of snapshots of the
+    subtrees and list of snapshots of solutions found while splitting. The
+    model is left as it was.
+    """
+
+    original = model.snapshot()
+    subtrees = [original]
+    solutions = []
+
+    while 0 < len(subtrees) < count:
+        snapshot = subtrees.pop(0)
+        model.restore(snapshot)
+        index = model._mostConstrainedLetter()
+
+        for number in NUMBERS[snapshot[index]]:
+            branch = model._branch(snapshot, index, NUMBER_BITS[number - 1])
+            if branch is None:
+                continue
+
+            if model.isSolved():
+                solutions.append(branch)
+            else:
+                subtrees.append(branch)
+
+    model.restore(original)
+    return subtrees, solutions
+
+################################################################################
+
+def countSolutions(model, limit, workers):
+    """
+    Counts solutions of the propagated, not yet solved model in a pool of
+    worker processes, each searching the subtrees from splitSubtrees() one by
+    one. As soon as limit solutions are found, the workers are told to stop
+    and subtrees not started yet are dropped. Returns the number of solutions
+    (at most limit) and snapshot of the first of them (None if there is none);
+    search nodes of all the workers are added to model.searchNodes.
+    """
+
+    subtrees, solutions = splitSubtrees(model, workers * SUBTREES_PER_WORKER)
+    count = len(solutions)
+    first = solutions[0] if count > 0 else None
+    if count >= limit or len(subtrees) == 0:
+        return min(count, limit), first
+
+    stop = multiprocessing.Event()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_initWorker,
+                             initargs=(model, stop)) as executor:
+        pending = {executor.submit(_countSubtree, subtree, limit - count)
+                   for subtree in subtrees}
+
+        try:
+            while len(pending) > 0 and count < limit \
+                    and not model._isCancelled():
+                done, pending = wait(pending, timeout=POLL_SECONDS,
+                                     return_when=FIRST_COMPLETED)
+
+                for future in done:
+                    subtreeCount, subtreeFirst, nodes = future.result()
+                    count += subtreeCount
+                    model.searchNodes += nodes
+                    if first is None:
+                        first = subtreeFirst
+        finally:
+            # running subtrees stop at their next node, the rest never start
+            stop.set()
+            for future in pending:
+                future.cancel()
+
+    return min(count, limit), first
+
+################################################################################
+
+def _solveComponent(letters):
+    """
+    Searches for a solution of one component in a worker process. Returns
+    whether it was found, possible numbers of the letters of the component
+    and the search counters.
+    """
+
+    _model.searchNodes = 0
+    _model.searchBacktracks = 0
+    _model.searchMaxDepth = 0
+    _model._cancel = _stop.is_set
+    _model._cancelled = False
+    try:
+        solved = _model._search(letters)
+    finally:
+        _model._cancel = None
+
+    snapshot = _model.snapshot()
+    return solved, [(index, snapshot[index]) for index in letters], \
+        _model.searchNodes, _model.searchBacktracks, _model.searchMaxDepth
+
+################################################################################
+
+def solveComponents(model, components, workers):
+    """
+    Solves the components of the propagated model (see Model.components()) in
+    a pool of worker processes, the biggest ones first. As soon as one of them
+    turns out to have no solution, the workers are told to stop. Solutions of
+    all the components are merged into the model at once. Returns True if the
+    puzzle was solved, False (leaving the model as it was) otherwise or when
+    cancelled.
+    """
+
+    snapshot = model.snapshot()
+    solved = True
+    stop = multiprocessing.Event()
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_initWorker,
+                             initargs=(model, stop)) as executor:
+        pending = {executor.submit(_solveComponent, component)
+                   for component in components}
+
+        try:
+            while len(pending) > 0 and solved and not model._isCancelled():
+                done, pending = wait(pending, timeout=POLL_SECONDS,
+                                     return_when=FIRST_COMPLETED)
+
+                for future in done:
+                    componentSolved, masks, nodes, backtracks, depth \
+                        = future.result()
+                    model.searchNodes += nodes
+                    model.searchBacktracks += backtracks
+                    model.searchMaxDepth = max(model.searchMaxDepth, depth)
+                    solved = solved and componentSolved
+
+                    for index, mask in masks:
+                        snapshot[index] = mask
+        finally:
+            # running components stop at their next node, the rest never start
+            stop.set()
+            for future in pending:
+                future.cancel()
+
+    if not solved or model._cancelled:
+        return False
+
+    model.restore(snapshot)
+    return True
+
+################################################################################
@@ -0,0 +1,151 @@
+__author__ = "Tofu Gang"
+
+import gzip
+import json
+from src.model import Model
+
+
+
+################################################################################
+
+# Many puzzles can be kept in one file in two formats:
+# - text: the usual rows of each puzzle, puzzles separated by an empty line; a
+#   line starting with NAME_PREFIX gives a name to the puzzle below it
+# - JSON Lines: one JSON object per line, the rows of the puzzle in PUZZLE_KEY
+#   and its name (optional) in NAME_KEY
+# A plain puzzle file is a text file with a single puzzle in it. Files ending
+# with GZIP_SUFFIX are compressed with gzip.
+TEXT = 'text'
+JSON_LINES = 'jsonl'
+JSON_LINES_SUFFIX = '.jsonl'
+GZIP_SUFFIX = '.gz'
+NAME_PREFIX = '#'
+NAME_KEY = 'name'
+PUZZLE_KEY = 'puzzle'
+
+################################################################################
+
+def fileFormat(fileName):
+    """
+    Returns format of the puzzle file given by its name: JSON_LINES for
+    .jsonl files (compressed or not), TEXT otherwise.
+    """
+
+    if fileName.endswith(GZIP_SUFFIX):
+        fileName = fileName[:-len(GZIP_SUFFIX)]
+    return JSON_LINES if fileName.endswith(JSON_LINES_SUFFIX) else TEXT
+
+################################################################################
+
+def openPuzzleFile(fileName, mode='r'):
+    """
+    Opens the puzzle file in text mode, through gzip if its name says it is
+    compressed.
+    """
+
+    if fileName.endswith(GZIP_SUFFIX):
+        return gzip.open(fileName, mode + 't')
+    return open(fileName, mode)
+
+################################################################################
+
+def readRecords(f, format=TEXT):
+    """
+    Generates puzzles from the open file one by one, each as a tuple of its
+    name (None if it has none) and list of its rows. Only one puzzle is held in
+    memory at a time, however big the file is.
+    """
+
+    if format == JSON_LINES:
+
+        for line in f:
+            line = line.strip()
+            if len(line) == 0:
+                continue
+
+            record = json.loads(line)
+            rows = record[PUZZLE_KEY]
+            if isinstance(rows, str):
+                rows = rows.split()
+            yield record.get(NAME_KEY), rows
+
+    else:
+        name = None
+        rows = []
+
+        for line in f:
+            line = line.strip()
+
+            if len(line) == 0:
+                if len(rows) > 0:
+                    yield name, rows
+                name = None
+                rows = []
+            elif line.startswith(NAME_PREFIX):
+                name = line[len(NAME_PREFIX):].strip()
+            else:
+                rows.extend(line.split())
+
+        if len(rows) > 0:
+            yield name, rows
+
+################################################################################
+
+def readModels(fileName):
+    """
+    Generates models of all puzzles in the file one by one, each as a tuple of
+    its name and the model.
+    """
+
+    with openPuzzleFile(fileName) as f:
+
+        for name, rows in readRecords(f, fileFormat(fileName)):
+            yield name, Model.fromLines(rows)
+
+################################################################################
+
+class PuzzleWriter(object):
+
+################################################################################
+
+    def __init__(self, f, format=TEXT):
+        """
+        Creates a writer of puzzles into the open file in the given format.
+        Every puzzle is written as soon as it is given, nothing is buffered
+        here.
+        """
+
+        self.f = f
+        self.format = format
+
+################################################################################
+
+    def writeRows(self, rows, name=None, **fields):
+        """
+        Writes one puzzle given by its rows. Other fields are written along
+        with the puzzle in JSON Lines format; they are left out in text format.
+        """
+
+        if self.format == JSON_LINES:
+            record = {}
+            if name is not None:
+                record[NAME_KEY] = name
+            record[PUZZLE_KEY] = list(rows)
+            record.update(fields)
+            self.f.write(json.dumps(record) + '\n')
+        else:
+            if name is not None:
+                self.f.write('%s %s\n' % (NAME_PREFIX, name))
+            self.f.write('\n'.join(rows) + '\n\n')
+
+################################################################################
+
+    def write(self, model, name=None, **fields):
+        """
+        Writes the puzzle of the model, solved letters written as their
+        numbers.
+        """
+
+        self.writeRows(model.toText().split(), name, **fields)
+
+################################################################################
@@ -0,0 +1,416 @@
+__author__ = "Tofu Gang"
+
+from argparse import ArgumentParser
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from multiprocessing import SimpleQueue
+from time import perf_counter
+import asyncio
+import json
+import os
+import signal
+import sys
+from src.batch import solveRecord
+from src.puzzleStream import NAME_KEY, PUZZLE_KEY
+
+
+
+################################################################################
+
+# Clients talk to the service over a TCP socket on the local host or over a
+# Unix socket in JSON Lines, one request per line and one answer per line:
+# - a request is a puzzle record of the JSON Lines puzzle format (the rows of
+#   the puzzle in PUZZLE_KEY, either a list or the text of the puzzle, and
+#   optionally its name in NAME_KEY), optionally with ID_KEY to match the
+#   answer with, SEARCH_KEY and TIMEOUT_KEY (in seconds) overriding the
+#   defaults of the service
+# - the answer is the result of src.batch.solveRecord() (status, solution,
+#   times...) with the id of the request (the number of the request on the
+#   connection if it has none), time it waited in the queue and time since
+#   it was received
+# - a request which is not valid is answered with status error and its id,
+#   or null if it has none
+# - a request with STATISTICS_KEY set to true is answered at once with the
+#   counters of the service
+# Requests of one connection are solved concurrently, so their answers come
+# in the order they are finished, not in the order they were sent.
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+ID_KEY = 'id'
+SEARCH_KEY = 'search'
+TIMEOUT_KEY = 'timeout'
+STATISTICS_KEY = 'statistics'
+# the longest request line read (a puzzle of about 1000x1000 squares)
+LINE_LIMIT = 16 * 1024 * 1024
+
+################################################################################
+
+def _initWorker(pids):
+    """
+    Lets SIGTERM end the worker process again: it is forked with the handler
+    of the event loop of the service, which would ignore it there. The
+    process id is sent back to the service, so it can terminate the worker.
+    """
+
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    pids.put(os.getpid())
+
+################################################################################
+
+def _requestId(line):
+    """
+    Returns the id sent with the request line, or None if it has none or is
+    not a JSON object at all.
+    """
+
+    try:
+        request = json.loads(line)
+    except ValueError:
+        return None
+    return request.get(ID_KEY) if isinstance(request, dict) else None
+
+################################################################################
+
+class SolverService(object):
+
+################################################################################
+
+    def __init__(self, workers=None, queueSize=None, search=False,
+                 timeout=None):
+        """
+        Service solving puzzles sent by clients in a pool of worker processes
+        (CPU count by default), so that neither the interpreter nor the solver
+        is started again for every puzzle. Requests wait in a queue of
+        queueSize (4 per worker by default); while it is full, no more
+        requests are read from the clients, so clients sending too fast are
+        slowed down by their sockets instead of the queue growing. search
+        and timeout (in seconds, counted from when the request is received)
+        are the defaults for requests which do not say otherwise.
+        """
+
+        self.workers = workers or os.cpu_count() or 1
+        self.queueSize = queueSize or 4 * self.workers
+        self.search = search
+        self.timeout = timeout
+        self.received = 0
+        self.answered = 0
+        self.timeouts = 0
+        self.errors = 0
+        self.clients = 0
+        self._queue = None
+        self._executor = None
+        # ids of the worker processes, sent by them as they start
+        self._workerPids = None
+
+################################################################################
+
+    async def serve(self, host=DEFAULT_HOST, port=DEFAULT_PORT, path=None,
+                    started=None):
+        """
+        Runs the service on the TCP port of the host, or on the Unix socket of
+        the path if given, until it is cancelled (or terminated by SIGTERM).
+        started, if given, is called with the server once it is listening.
+        """
+
+        loop = asyncio.get_running_loop()
+        try:
+            loop.add_signal_handler(signal.SIGTERM,
+                                    asyncio.current_task().cancel)
+        except NotImplementedError:
+            # no signal handlers in the event loops of Windows
+            pass
+        self._queue = asyncio.Queue(self.queueSize)
+        self._workerPids = SimpleQueue()
+        self._executor = self._newExecutor()
+        dispatchers = [asyncio.ensure_future(self._dispatch())
+                       for i in range(self.workers)]
+
+        try:
+            # start the worker processes before the first client comes
+            await loop.run_in_executor(self._executor, int)
+
+            if path is None:
+                server = await asyncio.start_server(
+                    self._serveClient, host, port, limit=LINE_LIMIT)
+            else:
+                server = await asyncio.start_unix_server(
+                    self._serveClient, path, limit=LINE_LIMIT)
+
+            async with server:
+                if started is not None:
+                    started(server)
+                await server.serve_forever()
+        finally:
+            for dispatcher in dispatchers:
+                dispatcher.cancel()
+            self.terminateWorkers()
+
+################################################################################
+
+    def _newExecutor(self):
+        """
+        Returns new pool of the worker processes.
+        """
+
+        return ProcessPoolExecutor(max_workers=self.workers,
+                                   initializer=_initWorker,
+                                   initargs=(self._workerPids,))
+
+################################################################################
+
+    def terminateWorkers(self):
+        """
+        Terminates the worker processes at once and shuts their pool down.
+        Puzzles being solved would keep the workers busy long after the
+        service is gone and the pool itself can only wait for them, so the
+        workers are terminated by the process ids they sent when they
+        started.
+        """
+
+        if self._executor is None:
+            return
+
+        while not self._workerPids.empty():
+            try:
+                os.kill(self._workerPids.get(), signal.SIGTERM)
+            except OSError:
+                # the worker is gone already
+                pass
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._executor = None
+
+################################################################################
+
+    def statistics(self):
+        """
+        Returns dictionary with the counters of the service.
+        """
+
+        return {
+            'workers': self.workers,
+            'queueSize': self.queueSize,
+            'queued': 0 if self._queue is None else self._queue.qsize(),
+            'clients': self.clients,
+            'received': self.received,
+            'answered': self.answered,
+            'timeouts': self.timeouts,
+            'errors': self.errors
+        }
+
+################################################################################
+
+    def _request(self, line, number):
+        """
+        Returns the puzzle record for src.batch.solveRecord(), options of the
+        request (id, search and timeout) and whether it asks for the
+        statistics. Raises ValueError if the line is not a valid request.
+        """
+
+        request = json.loads(line)
+        if not isinstance(request, dict):
+            raise ValueError('request is not a JSON object')
+
+        options = {
+            ID_KEY: request.get(ID_KEY, number),
+            SEARCH_KEY: bool(request.get(SEARCH_KEY, self.search)),
+            TIMEOUT_KEY: request.get(TIMEOUT_KEY, self.timeout)
+        }
+        if options[TIMEOUT_KEY] is not None \
+                and not isinstance(options[TIMEOUT_KEY], (int, float)):
+            raise ValueError('%s is not a number' % TIMEOUT_KEY)
+        if request.get(STATISTICS_KEY):
+            return None, options, True
+
+        rows = request.get(PUZZLE_KEY)
+        if isinstance(rows, str):
+            rows = rows.split()
+        if not isinstance(rows, list) or len(rows) == 0:
+            raise ValueError('request has no %s' % PUZZLE_KEY)
+
+        record = {'file': None, 'index': number,
+                  'name': request.get(NAME_KEY), 'rows': rows}
+        return record, options, False
+
+################################################################################
+
+    async def _serveClient(self, reader, writer):
+        """
+        Reads requests of one client and queues them, waiting while the queue
+        is full. Every request gets its own task waiting for the answer, so
+        the answers are written as soon as they are ready. When the client
+        is lost, its requests still waiting in the queue are dropped; when it
+        only stops sending, the rest of the answers is still written.
+        """
+
+        self.clients += 1
+        lock = asyncio.Lock()
+        answers = []
+        number = 0
+
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError:
+                    # too long a line, the rest of the stream makes no sense
+                    break
+                except ConnectionError:
+                    return
+                if len(line) == 0:
+                    break
+                if len(line.strip()) == 0:
+                    continue
+
+                received = perf_counter()
+                self.received += 1
+                answer = asyncio.get_running_loop().create_future()
+
+                try:
+                    record, options, wantsStatistics \
+                        = self._request(line, number)
+                except ValueError as e:
+                    self.errors += 1
+                    answer.set_result({ID_KEY: _requestId(line),
+                                       'status': 'error',
+                                       'error': '%s: %s'
+                                                % (type(e).__name__, e)})
+                else:
+                    if wantsStatistics:
+                        statistics = self.statistics()
+                        statistics[ID_KEY] = options[ID_KEY]
+                        answer.set_result(statistics)
+                    else:
+                        await self._queue.put((record, options, received,
+                                               answer))
+
+                answers.append(asyncio.ensure_future(
+                    self._answer(writer, lock, answer)))
+                number += 1
+
+            await asyncio.gather(*answers)
+        except asyncio.CancelledError:
+            # the service is shutting down
+            pass
+        finally:
+            for answer in answers:
+                answer.cancel()
+            self.clients -= 1
+            writer.close()
+
+################################################################################
+
+    async def _answer(self, writer, lock, answer):
+        """
+        Writes the answer to the client once it is ready. If the client went
+        away meanwhile, the answer is dropped.
+        """
+
+        result = await answer
+
+        async with lock:
+            try:
+                writer.write(json.dumps(result).encode('utf-8') + b'\n')
+                await writer.drain()
+            except ConnectionError:
+                pass
+
+################################################################################
+
+    async def _dispatch(self):
+        """
+        Takes requests from the queue one by one and solves them in the pool
+        of workers. There is one dispatcher per worker, so no more puzzles are
+        handed to the pool than it can solve at once and the rest waits in
+        the queue.
+        """
+
+        loop = asyncio.get_running_loop()
+
+        while True:
+            record, options, received, answer = await self._queue.get()
+            if answer.cancelled():
+                continue
+
+            started = perf_counter()
+            timeout = options[TIMEOUT_KEY]
+            if timeout is not None:
+                timeout -= started - received
+
+            if timeout is not None and timeout <= 0:
+                result = {'name': record['name'], 'status': 'timeout'}
+            else:
+                executor = self._executor
+                try:
+                    result = await loop.run_in_executor(
+                        executor,
+                        partial(solveRecord, record,
+                                search=options[SEARCH_KEY], timeout=timeout))
+                    del result['file'], result['index']
+                except BrokenProcessPool as e:
+                    # a worker died (killed or out of memory), the service
+                    # goes on with a new pool
+                    if self._executor is executor:
+                        self._executor = self._newExecutor()
+                    result = {'name': record['name'], 'status': 'error',
+                              'error': '%s: %s' % (type(e).__name__, e)}
+
+            if result['status'] == 'timeout':
+                self.timeouts += 1
+            elif result['status'] == 'error':
+                self.errors += 1
+            self.answered += 1
+            result[ID_KEY] = options[ID_KEY]
+            result['queueSeconds'] = started - received
+            result['seconds'] = perf_counter() - received
+            if not answer.done():
+                answer.set_result(result)
+
+################################################################################
+
+def main(argv=None):
+    """
+    Runs the solver service until it is interrupted or terminated.
+    """
+
+    parser = ArgumentParser(prog='python -m src.service',
+                            description='Solve Kakuro puzzles sent over a '
+                                        'local socket in JSON Lines.')
+    parser.add_argument('--host', default=DEFAULT_HOST,
+                        help='address to listen on (default: %s)'
+                             % DEFAULT_HOST)
+    parser.add_argument('-p', '--port', type=int, default=DEFAULT_PORT,
+                        help='TCP port to listen on (default: %d)'
+                             % DEFAULT_PORT)
+    parser.add_argument('-u', '--unix', metavar='PATH',
+                        help='listen on a Unix socket instead of TCP')
+    parser.add_argument('-w', '--workers', type=int, default=os.cpu_count() or 1,
+                        help='number of worker processes (default: CPU count)')
+    parser.add_argument('-q', '--queue-size', type=int,
+                        help='requests waiting for a worker before no more are '
+                             'read from the clients (default: 4 per worker)')
+    parser.add_argument('-s', '--search', action='store_true',
+                        help='search by trial and error when the heuristics '
+                             'are not enough, unless a request says otherwise')
+    parser.add_argument('--timeout', type=float, metavar='SECONDS',
+                        help='default time limit of a request, counted from '
+                             'when it is received')
+    args = parser.parse_args(argv)
+
+    service = SolverService(args.workers, args.queue_size, args.search,
+                            args.timeout)
+    started = lambda server: sys.stderr.write(
+        'listening on %s\n' % ', '.join(str(socket.getsockname())
+                                        for socket in server.sockets))
+
+    try:
+        asyncio.run(service.serve(args.host, args.port, args.unix, started))
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        pass
+
+################################################################################
+
+if __name__ == '__main__':
+    main()
+
+################################################################################
@@ -0,0 +1,237 @@
+__author__ = "Tofu Gang"
+
+from argparse import ArgumentParser
+import asyncio
+import json
+import sys
+from src.batch import puzzleFiles, puzzleRecords, openCorpus
+from src.puzzleStream import NAME_KEY, PUZZLE_KEY
+from src.service import DEFAULT_HOST, DEFAULT_PORT, ID_KEY, SEARCH_KEY, \
+    TIMEOUT_KEY, STATISTICS_KEY, LINE_LIMIT
+
+
+
+################################################################################
+
+class ServiceClient(object):
+
+################################################################################
+
+    def __init__(self, reader, writer):
+        """
+        Client of the solver service (see src.service) on an open connection;
+        use connect() to open one. Many requests can wait for their answers
+        on one connection at once.
+        """
+
+        self._reader = reader
+        self._writer = writer
+        self._answers = {}
+        self._nextId = 0
+        self._reading = asyncio.ensure_future(self._readAnswers())
+
+################################################################################
+
+    @classmethod
+    async def connect(cls, host=DEFAULT_HOST, port=DEFAULT_PORT, path=None):
+        """
+        Connects to the service on the TCP port of the host, or on the Unix
+        socket of the path if given.
+        """
+
+        if path is None:
+            reader, writer = await asyncio.open_connection(host, port,
+                                                           limit=LINE_LIMIT)
+        else:
+            reader, writer = await asyncio.open_unix_connection(
+                path, limit=LINE_LIMIT)
+        return cls(reader, writer)
+
+################################################################################
+
+    async def _send(self, request):
+        """
+        Sends the request with a new id and returns its answer.
+        """
+
+        requestId = self._nextId
+        self._nextId += 1
+        request[ID_KEY] = requestId
+        answer = self._answers[requestId] \
+            = asyncio.get_running_loop().create_future()
+
+        try:
+            self._writer.write(json.dumps(request).encode('utf-8') + b'\n')
+            await self._writer.drain()
+            return await answer
+        finally:
+            del self._answers[requestId]
+
+################################################################################
+
+    async def solve(self, rows, name=None, search=None, timeout=None):
+        """
+        Sends the puzzle given by its rows to the service and returns the
+        answer, a dictionary like the results of src.batch. search and
+        timeout (in seconds), if given, override the defaults of the service.
+        """
+
+        request = {PUZZLE_KEY: list(rows)}
+        if name is not None:
+            request[NAME_KEY] = name
+        if search is not None:
+            request[SEARCH_KEY] = search
+        if timeout is not None:
+            request[TIMEOUT_KEY] = timeout
+        return await self._send(request)
+
+################################################################################
+
+    async def statistics(self):
+        """
+        Returns the counters of the service.
+        """
+
+        return await self._send({STATISTICS_KEY: True})
+
+################################################################################
+
+    async def _readAnswers(self):
+        """
+        Reads answers and hands them to the requests waiting for them. When
+        the connection is closed, the requests still waiting get an error.
+        """
+
+        try:
+            while True:
+                line = await self._reader.readline()
+                if len(line) == 0:
+                    break
+
+                result = json.loads(line)
+                answer = self._answers.get(result.get(ID_KEY))
+                if answer is not None and not answer.done():
+                    answer.set_result(result)
+        finally:
+            for answer in self._answers.values():
+                if not answer.done():
+                    answer.set_exception(
+                        ConnectionError('connection to the service closed'))
+
+################################################################################
+
+    async def close(self):
+        """
+        Closes the connection.
+        """
+
+        self._writer.close()
+        try:
+            await self._writer.wait_closed()
+        except ConnectionError:
+            pass
+        self._reading.cancel()
+
+################################################################################
+
+async def solveFiles(client, records, concurrency, search=None, timeout=None,
+                     out=sys.stdout):
+    """
+    Sends all the puzzle records (see src.batch.puzzleRecords()) to the
+    service, at most concurrency of them waiting for answers at a time, and
+    writes the answers as JSON lines as they come, with the file and number
+    of the puzzle in it. Returns True if all the puzzles were solved.
+    """
+
+    records = iter(records)
+    allSolved = True
+
+    async def solveNext():
+        nonlocal allSolved
+
+        for record in records:
+            if 'error' in record:
+                result = {'name': record['name'], 'status': 'error',
+                          'error': record['error']}
+            else:
+                rows = record.get('rows')
+                if rows is None:
+                    rows = openCorpus(record['file']).model(record['index']) \
+                        .toText().split()
+                result = await client.solve(rows, record['name'], search,
+                                            timeout)
+            result['file'] = record['file']
+            result['index'] = record['index']
+            allSolved = allSolved and result['status'] == 'solved'
+            out.write(json.dumps(result) + '\n')
+            out.flush()
+
+    await asyncio.gather(*(solveNext() for i in range(concurrency)))
+    return allSolved
+
+################################################################################
+
+async def _main(args):
+    """
+    Connects to the service and solves the puzzles given on the command line,
+    or prints the statistics of the service.
+    """
+
+    client = await ServiceClient.connect(args.host, args.port, args.unix)
+
+    try:
+        if args.statistics:
+            json.dump(await client.statistics(), sys.stdout, indent=1)
+            sys.stdout.write('\n')
+            return True
+
+        search = True if args.search else None
+        records = puzzleRecords(puzzleFiles(args.paths))
+        return await solveFiles(client, records, args.concurrency, search,
+                                args.timeout)
+    finally:
+        await client.close()
+
+################################################################################
+
+def main(argv=None):
+    """
+    Solves puzzle files by the solver service. Returns exit status: 0 if all
+    the puzzles were solved, 1 otherwise.
+    """
+
+    parser = ArgumentParser(prog='python -m src.serviceClient',
+                            description='Solve Kakuro puzzle files by a '
+                                        'running solver service.')
+    parser.add_argument('paths', nargs='*',
+                        help='puzzle files (text, .jsonl, optionally .gz, '
+                             'or binary .kkc corpora), directories or glob '
+                             'patterns')
+    parser.add_argument('--host', default=DEFAULT_HOST,
+                        help='address of the service (default: %s)'
+                             % DEFAULT_HOST)
+    parser.add_argument('-p', '--port', type=int, default=DEFAULT_PORT,
+                        help='TCP port of the service (default: %d)'
+                             % DEFAULT_PORT)
+    parser.add_argument('-u', '--unix', metavar='PATH',
+                        help='Unix socket of the service instead of TCP')
+    parser.add_argument('-c', '--concurrency', type=int, default=8,
+                        help='puzzles waiting for answers at once '
+                             '(default: 8)')
+    parser.add_argument('-s', '--search', action='store_true',
+                        help='search by trial and error when the heuristics '
+                             'are not enough')
+    parser.add_argument('--timeout', type=float, metavar='SECONDS',
+                        help='time limit of every puzzle')
+    parser.add_argument('--statistics', action='store_true',
+                        help='print the counters of the service and exit')
+    args = parser.parse_args(argv)
+
+    return 0 if asyncio.run(_main(args)) else 1
+
+################################################################################
+
+if __name__ == '__main__':
+    sys.exit(main())
+
+################################################################################
@@ -0,0 +1,321 @@
+__author__ = "Tofu Gang"
+
+from collections import OrderedDict
+from hashlib import sha256
+from time import time
+import json
+import os
+import sqlite3
+from src.model import Model
+
+
+
+################################################################################
+
+def fingerprint(model):
+    """
+    Returns canonical hash of the puzzle: the same for every text of the same
+    clue grid, whatever whitespace or form of empty clues it was written with,
+    since it is computed from the parsed model, not from the file. Only kinds
+    of the squares and the clues are hashed, not the possible numbers of the
+    letters, so the puzzle has the same fingerprint however far it is solved.
+    """
+
+    layout = sha256(('%d %d' % (model.width, model.height)).encode('ascii'))
+
+    for i in range(model.height):
+
+        for j in range(model.width):
+            horizontal, vertical = model.clues(i, j)
+            layout.update((' %d %d %d' % (model.kind(i, j), horizontal or 0,
+                                          vertical or 0)).encode('ascii'))
+
+    return layout.hexdigest()
+
+################################################################################
+
+def applySolution(model, rows):
+    """
+    Sets letters of the model to the solution given by its rows. It goes
+    through Model.restore(), so observers of the model see the changes as
+    usual. The solution is applied only if it is of the same puzzle, every
+    word of it sums up to its clue with no number repeated and every letter
+    keeps a number still possible in the model; otherwise the model is left
+    as it was. Returns True if the solution was applied.
+    """
+
+    solution = Model.fromLines(rows)
+    if fingerprint(solution) != fingerprint(model) or not solution.isSolved():
+        return False
+
+    snapshot = solution.snapshot()
+    current = model.snapshot()
+    if any(mask & current[index] != mask
+           for index, mask in enumerate(snapshot)):
+        return False
+
+    model.restore(snapshot)
+    return True
+
+################################################################################
+
+class MemoryTier(object):
+
+################################################################################
+
+    def __init__(self, maxEntries=1024):
+        """
+        Keeps the most recently used solutions in memory, at most maxEntries
+        of them.
+        """
+
+        self.maxEntries = maxEntries
+        self._entries = OrderedDict()
+        self.evictions = 0
+
+################################################################################
+
+    def get(self, key):
+        """
+        Returns the cached solution rows, or None.
+        """
+
+        rows = self._entries.get(key)
+        if rows is not None:
+            self._entries.move_to_end(key)
+        return rows
+
+################################################################################
+
+    def put(self, key, rows):
+        """
+        Stores the solution rows, evicting the least recently used ones if
+        there are too many.
+        """
+
+        self._entries[key] = rows
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxEntries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+################################################################################
+
+    def __len__(self):
+        return len(self._entries)
+
+################################################################################
+
+class DiskTier(object):
+
+################################################################################
+
+    def __init__(self, fileName, maxBytes=64 * 1024 * 1024):
+        """
+        Keeps solutions in an SQLite database, which can be shared by several
+        processes. When the stored solutions take more than maxBytes, the
+        least recently used ones are deleted.
+        """
+
+        self.fileName = fileName
+        self.maxBytes = maxBytes
+        self.evictions = 0
+        directory = os.path.dirname(fileName)
+        if len(directory) > 0:
+            os.makedirs(directory, exist_ok=True)
+        self._connection = sqlite3.connect(fileName, timeout=30)
+        with self._connection:
+            self._connection.execute(
+                'CREATE TABLE IF NOT EXISTS solutions ('
+                'key TEXT PRIMARY KEY, rows TEXT NOT NULL, '
+                'size INTEGER NOT NULL, used REAL NOT NULL)')
+            self._connection.execute(
+                'CREATE INDEX IF NOT EXISTS solutionsUsed ON solutions (used)')
+
+################################################################################
+
+    def get(self, key):
+        """
+        Returns the cached solution rows, or None.
+        """
+
+        row = self._connection.execute(
+            'SELECT rows FROM solutions WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return None
+
+        with self._connection:
+            self._connection.execute(
+                'UPDATE solutions SET used = ? WHERE key = ?', (time(), key))
+        return json.loads(row[0])
+
+################################################################################
+
+    def put(self, key, rows):
+        """
+        Stores the solution rows and evicts the least recently used solutions
+        if the size limit is exceeded.
+        """
+
+        text = json.dumps(rows)
+        with self._connection:
+            self._connection.execute(
+                'INSERT OR REPLACE INTO solutions VALUES (?, ?, ?, ?)',
+                (key, text, len(text), time()))
+            self._evict()
+
+################################################################################
+
+    def _evict(self):
+        """
+        Deletes the least recently used solutions until the rest fits into
+        maxBytes.
+        """
+
+        total = self._connection.execute(
+            'SELECT COALESCE(SUM(size), 0) FROM solutions').fetchone()[0]
+
+        if total > self.maxBytes:
+            cursor = self._connection.execute(
+                'SELECT key, size FROM solutions ORDER BY used')
+            keys = []
+
+            for key, size in cursor:
+                if total <= self.maxBytes:
+                    break
+                keys.append((key,))
+                total -= size
+
+            self._connection.executemany(
+                'DELETE FROM solutions WHERE key = ?', keys)
+            self.evictions += len(keys)
+
+################################################################################
+
+    def __len__(self):
+        return self._connection.execute(
+            'SELECT COUNT(*) FROM solutions').fetchone()[0]
+
+################################################################################
+
+    def close(self):
+        """
+        Closes the database.
+        """
+
+        self._connection.close()
+
+################################################################################
+
+class SolutionCache(object):
+
+################################################################################
+
+    def __init__(self, fileName=None, maxEntries=1024,
+                 maxBytes=64 * 1024 * 1024):
+        """
+        Cache of solved puzzles keyed by fingerprint(): an LRU in memory in
+        front of an SQLite file (if its name is given). Only solved puzzles
+        are stored by solve(), and solutions read back are checked by
+        applySolution() before they are used, so a broken grid (say, written
+        to the file by an older version) is never taken as a solution.
+        """
+
+        self.memory = MemoryTier(maxEntries)
+        self.disk = None if fileName is None else DiskTier(fileName, maxBytes)
+        self.memoryHits = 0
+        self.diskHits = 0
+        self.misses = 0
+        self.stores = 0
+
+################################################################################
+
+    def get(self, key):
+        """
+        Returns solution rows of the puzzle with given fingerprint, or None.
+        """
+
+        rows = self.memory.get(key)
+        if rows is not None:
+            self.memoryHits += 1
+            return rows
+
+        if self.disk is not None:
+            rows = self.disk.get(key)
+            if rows is not None:
+                self.diskHits += 1
+                self.memory.put(key, rows)
+                return rows
+
+        self.misses += 1
+        return None
+
+################################################################################
+
+    def put(self, key, rows):
+        """
+        Stores solution rows of the puzzle with given fingerprint.
+        """
+
+        rows = list(rows)
+        self.stores += 1
+        self.memory.put(key, rows)
+        if self.disk is not None:
+            self.disk.put(key, rows)
+
+################################################################################
+
+    def solve(self, model, search=False, cancel=None, timeout=None):
+        """
+        Solves the model like Model.solve(), but takes the solution from the
+        cache if the puzzle was solved before and stores new solutions.
+        Returns True if the solution came from the cache, False if the solver
+        was run (model.stopStatus then tells whether it was stopped).
+        """
+
+        key = fingerprint(model)
+        rows = self.get(key)
+
+        if rows is not None and applySolution(model, rows):
+            return True
+
+        model.solve(search=search, cancel=cancel, timeout=timeout)
+        # isSolved() checks sums and repeated numbers of all the words, so a
+        # grid breaking the rules is never stored
+        if model.isSolved():
+            self.put(key, model.toText().split())
+        return False
+
+################################################################################
+
+    def statistics(self):
+        """
+        Returns dictionary with hits, misses, stored solutions and evictions of
+        both tiers.
+        """
+
+        hits = self.memoryHits + self.diskHits
+        lookups = hits + self.misses
+        return {
+            'memoryHits': self.memoryHits,
+            'diskHits': self.diskHits,
+            'misses': self.misses,
+            'hitRate': hits / lookups if lookups > 0 else 0.0,
+            'stores': self.stores,
+            'memoryEntries': len(self.memory),
+            'memoryEvictions': self.memory.evictions,
+            'diskEntries': None if self.disk is None else len(self.disk),
+            'diskEvictions': None if self.disk is None else self.disk.evictions
+        }
+
+################################################################################
+
+    def close(self):
+        """
+        Closes the disk tier.
+        """
+
+        if self.disk is not None:
+            self.disk.close()
+
+################################################################################
@@ -0,0 +1,277 @@
+__author__ = "Tofu Gang"
+
+from array import array
+# NumPy is needed only here, the rest of the solver does not import this module
+import numpy
+from src.model import ALL_NUMBERS, POPCOUNT, CROSS_SUMS
+
+
+
+################################################################################
+
+# the longest word of a puzzle
+MAX_LENGTH = 9
+# the biggest clue a word can have (1 + 2 + ... + 9); bigger clues are looked
+# up in the row past it, which has no combinations
+MAX_CLUE = 45
+# count of possible numbers in a mask, as an array to index with masks
+POPCOUNTS = numpy.array(POPCOUNT, dtype=numpy.uint8)
+
+################################################################################
+
+def _combinationsTable():
+    """
+    Returns the cheat sheet as one array indexed by word length and clue: masks
+    of all number combinations of the word, padded with zeros. The last
+    clue, MAX_CLUE + 1, stands for all the clues too big for any word.
+    """
+
+    width = max(len(crossSum.combinations) for crossSum in CROSS_SUMS.values())
+    table = numpy.zeros((MAX_LENGTH + 1, MAX_CLUE + 2, width),
+                        dtype=numpy.uint16)
+
+    for (length, clue), crossSum in CROSS_SUMS.items():
+        table[length, clue, :len(crossSum.combinations)] = crossSum.combinations
+
+    return table
+
+################################################################################
+
+COMBINATIONS = _combinationsTable()
+
+################################################################################
+
+class BatchPropagator(object):
+
+################################################################################
+
+    def __init__(self, models):
+        """
+        Packs possible numbers and words of the given models into NumPy arrays,
+        so the rules can be applied to all of them at once instead of looping
+        over letters and words in Python. All the models must have the same
+        width and height.
+        """
+
+        self.models = list(models)
+        if len(self.models) == 0:
+            raise ValueError('no puzzles given')
+
+        width = self.models[0].width
+        height = self.models[0].height
+        if any(model.width != width or model.height != height
+               for model in self.models):
+            raise ValueError('all puzzles must have the same size')
+
+        count = len(self.models)
+        cells = width * height
+        runs = max(len(model.runs) for model in self.models)
+        self.rounds = 0
+
+        # possible numbers of every square of every puzzle; the last column is
+        # an empty square where padded positions of words point to
+        self.domains = numpy.zeros((count, cells + 1), dtype=numpy.uint16)
+        # squares of every word (padded with the empty square), whether the
+        # position is really a letter and clues and lengths of the words
+        self.runCells = numpy.full((count, runs, MAX_LENGTH), cells,
+                                   dtype=numpy.intp)
+        self.runValid = numpy.zeros((count, runs, MAX_LENGTH), dtype=bool)
+        self.runClues = numpy.zeros((count, runs), dtype=numpy.intp)
+        self.runLengths = numpy.zeros((count, runs), dtype=numpy.intp)
+        # for every square its two word positions as (word * 9 + position); a
+        # square which is not a letter points to an extra word past the end
+        self.cellSlots = numpy.full((count, cells, 2), runs * MAX_LENGTH,
+                                    dtype=numpy.intp)
+
+        for k, model in enumerate(self.models):
+            self.domains[k, :cells] = model._domains
+
+            for r, run in enumerate(model.runs):
+                length = len(run.indexes)
+                self.runCells[k, r, :length] = run.indexes
+                self.runValid[k, r, :length] = True
+                self.runClues[k, r] = run.clue
+                self.runLengths[k, r] = length
+                side = 0 if run.orientation == model.HORIZONTAL else 1
+
+                for position, index in enumerate(run.indexes):
+                    self.cellSlots[k, index, side] = r * MAX_LENGTH + position
+
+        # whether the square is a letter: in a horizontal word, a vertical one
+        # or both
+        self.letters = (self.cellSlots < runs * MAX_LENGTH).any(axis=2)
+        self.active = numpy.ones(count, dtype=bool)
+
+################################################################################
+
+    def _words(self, puzzles):
+        """
+        Returns possible numbers of all word positions of the given puzzles as
+        an array of shape (puzzles, words, 9).
+        """
+
+        return self.domains[puzzles[:, None, None], self.runCells[puzzles]]
+
+################################################################################
+
+    def _restrict(self, puzzles, keep):
+        """
+        Keeps only the given numbers in word positions of the given puzzles,
+        keep having the shape of _words(). Every letter is in two words, so it
+        keeps what both of them allow. Returns for every puzzle whether any of
+        its letters changed.
+        """
+
+        count, runs, length = keep.shape
+        # the extra word past the end keeps everything
+        keep = numpy.concatenate(
+            (keep.reshape(count, runs * length),
+             numpy.full((count, length), ALL_NUMBERS, dtype=numpy.uint16)),
+            axis=1)
+        slots = self.cellSlots[puzzles]
+        rows = numpy.arange(count)[:, None]
+        allowed = keep[rows, slots[:, :, 0]] & keep[rows, slots[:, :, 1]]
+
+        before = self.domains[puzzles, :-1]
+        after = before & allowed
+        self.domains[puzzles, :-1] = after
+        return (after != before).any(axis=1)
+
+################################################################################
+
+    def crossSumRule(self, puzzles):
+        """
+        The raw heuristic taking possible numbers into account: a combination
+        from the cheat sheet can still be used for a word only if all its
+        numbers are possible somewhere in the word and every letter can take
+        one of them. Letters keep only numbers of the combinations which can
+        still be used. Returns for every given puzzle whether it changed.
+        """
+
+        words = self._words(puzzles)
+        valid = self.runValid[puzzles]
+        # a clue too big for any word has no combinations, as in the model
+        combs = COMBINATIONS[self.runLengths[puzzles],
+                             numpy.minimum(self.runClues[puzzles],
+                                           MAX_CLUE + 1)]
+        union = numpy.bitwise_or.reduce(words, axis=2)
+
+        # shape (puzzles, words, combinations, positions)
+        reachable = ((words[:, :, None, :] & combs[:, :, :, None]) != 0) \
+                    | ~valid[:, :, None, :]
+        usable = (combs != 0) & ((combs & ~union[:, :, None]) == 0) \
+                 & reachable.all(axis=3)
+        possible = numpy.bitwise_or.reduce(
+            numpy.where(usable, combs, 0).astype(numpy.uint16), axis=2)
+        # padded words have no clue, they must not restrict anything
+        possible = numpy.where(self.runLengths[puzzles] > 0, possible,
+                               ALL_NUMBERS).astype(numpy.uint16)
+
+        keep = numpy.broadcast_to(possible[:, :, None], words.shape)
+        return self._restrict(puzzles, numpy.ascontiguousarray(keep))
+
+################################################################################
+
+    def duplicatesRule(self, puzzles):
+        """
+        The generalized repetition heuristic: if N letters of a word have the
+        same N possible numbers, other letters of the word cannot take them.
+        A solved letter is the case of N = 1, so this also removes numbers of
+        solved letters from the rest of their words. Returns for every given
+        puzzle whether it changed.
+        """
+
+        words = self._words(puzzles)
+        valid = self.runValid[puzzles]
+
+        # shape (puzzles, words, positions, positions)
+        same = (words[:, :, :, None] == words[:, :, None, :]) \
+               & valid[:, :, :, None] & valid[:, :, None, :]
+        sameCount = same.sum(axis=3)
+        naked = valid & (words != 0) & (sameCount == POPCOUNTS[words])
+
+        excluded = numpy.where(naked[:, :, :, None] & ~same,
+                               words[:, :, :, None], 0).astype(numpy.uint16)
+        excluded = numpy.bitwise_or.reduce(excluded, axis=2)
+
+        keep = (~excluded & ALL_NUMBERS).astype(numpy.uint16)
+        return self._restrict(puzzles, keep)
+
+################################################################################
+
+    def isSolved(self):
+        """
+        Returns for every puzzle whether all its letters are solved.
+        """
+
+        counts = POPCOUNTS[self.domains[:, :-1]]
+        return ((counts == 1) | ~self.letters).all(axis=1)
+
+################################################################################
+
+    def isFailed(self):
+        """
+        Returns for every puzzle whether some of its letters has no possible
+        numbers left.
+        """
+
+        return ((self.domains[:, :-1] == 0) & self.letters).any(axis=1)
+
+################################################################################
+
+    def propagate(self, maxRounds=None):
+        """
+        Applies both rules in rounds to all active puzzles. A puzzle which did
+        not change in a round, got solved or failed drops out of the active
+        set, so later rounds work only on puzzles with something left to do.
+        Returns the number of rounds made.
+        """
+
+        self.rounds = 0
+
+        while self.active.any() and (maxRounds is None
+                                     or self.rounds < maxRounds):
+            puzzles = numpy.flatnonzero(self.active)
+            changed = self.crossSumRule(puzzles)
+            changed |= self.duplicatesRule(puzzles)
+            self.rounds += 1
+
+            self.active[puzzles] = changed
+            self.active &= ~self.isSolved() & ~self.isFailed()
+
+        return self.rounds
+
+################################################################################
+
+    def toModels(self):
+        """
+        Writes possible numbers back to the models and returns them.
+        """
+
+        for k, model in enumerate(self.models):
+            model._domains[:] = array('H', self.domains[k, :-1].tolist())
+
+        return self.models
+
+################################################################################
+
+def propagateModels(models, maxRounds=None):
+    """
+    Propagates the rules in all the given models, packing models of the same
+    size together. Models are changed in place and returned in the same order.
+    """
+
+    models = list(models)
+    groups = {}
+
+    for model in models:
+        groups.setdefault((model.width, model.height), []).append(model)
+
+    for group in groups.values():
+        propagator = BatchPropagator(group)
+        propagator.propagate(maxRounds)
+        propagator.toModels()
+
+    return models
+
+################################################################################
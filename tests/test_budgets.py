@@ -0,0 +1,70 @@
+__author__ = "Tofu Gang"
+
+import unittest
+from benchmarks.generator import generatePuzzle
+from src.batch import solveRecord
+from src.model import Model
+
+
+
+################################################################################
+
+class BudgetsTest(unittest.TestCase):
+
+################################################################################
+
+    def setUp(self):
+        self.rows = generatePuzzle(12, 12, 0.3, 0).split()
+
+################################################################################
+
+    def testCancelBeforeSolve(self):
+        model = Model.fromLines(self.rows)
+        model.cancel()
+
+        self.assertEqual(model.solve(search=True).status, Model.CANCELLED)
+        self.assertEqual(model.stopStatus, Model.CANCELLED)
+        # the cancel() was used up by the solving it stopped
+        self.assertEqual(model.solve(search=True).status, Model.SOLVED)
+        self.assertIsNone(model.stopStatus)
+
+################################################################################
+
+    def testCancelBeforeCount(self):
+        model = Model.fromLines(self.rows)
+        model.cancel()
+        model.countSolutions()
+
+        self.assertEqual(model.stopStatus, Model.CANCELLED)
+        self.assertEqual(model.countSolutions(),
+                         Model.fromLines(self.rows).countSolutions())
+        self.assertIsNone(model.stopStatus)
+
+################################################################################
+
+    def testTimeout(self):
+        model = Model.fromLines(self.rows)
+        self.assertEqual(model.solve(search=True, timeout=0).status,
+                         Model.EXHAUSTED)
+
+        model = Model.fromLines(self.rows)
+        model.countSolutions(timeout=0)
+        self.assertEqual(model.stopStatus, Model.EXHAUSTED)
+
+################################################################################
+
+    def testBatchTimeout(self):
+        record = {'file': '-', 'index': 0, 'name': None, 'rows': self.rows}
+
+        for options in ({}, {'countLimit': 2}):
+            self.assertEqual(solveRecord(record, search=True, timeout=0,
+                                         **options)['status'], 'timeout')
+            self.assertEqual(solveRecord(record, search=True,
+                                         **options)['status'], 'solved')
+
+################################################################################
+
+if __name__ == '__main__':
+    unittest.main()
+
+################################################################################
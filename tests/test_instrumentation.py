@@ -0,0 +1,62 @@
+__author__ = "Tofu Gang"
+
+import unittest
+from benchmarks.generator import generatePuzzle
+from src.model import Model
+from tests.test_search import BROKEN_WORD
+
+
+
+################################################################################
+
+class InstrumentationTest(unittest.TestCase):
+
+################################################################################
+
+    def checkRounds(self, model):
+        """
+        Checks that every word propagated by the last solve() is in some round
+        and that no round is empty.
+        """
+
+        rounds = model.instrumentation.summary()['rounds']
+
+        self.assertGreater(len(rounds), 0)
+        self.assertEqual(sum(round['runs'] for round in rounds),
+                         model.propagationSteps)
+        self.assertTrue(all(round['runs'] > 0 for round in rounds))
+
+################################################################################
+
+    def testRounds(self):
+        model = Model.fromLines(generatePuzzle(8, 8, 0.3, 0).split())
+        model.enableInstrumentation()
+        model.solve()
+
+        self.checkRounds(model)
+
+################################################################################
+
+    def testRoundOfFailure(self):
+        model = Model.fromLines(BROKEN_WORD)
+        model.rules = [Model.HIDDEN_SINGLES]
+        model.enableInstrumentation()
+
+        self.assertEqual(model.solve().status, Model.UNSOLVABLE)
+        self.checkRounds(model)
+
+################################################################################
+
+    def testRoundOfCancelled(self):
+        model = Model.fromLines(generatePuzzle(12, 12, 0.3, 0).split())
+        model.enableInstrumentation()
+
+        self.assertEqual(model.solve(maxSteps=1).status, Model.EXHAUSTED)
+        self.checkRounds(model)
+
+################################################################################
+
+if __name__ == '__main__':
+    unittest.main()
+
+################################################################################
@@ -0,0 +1,240 @@
+__author__ = "Tofu Gang"
+
+import unittest
+from benchmarks.generator import generatePuzzle
+from src.model import Model
+
+
+
+################################################################################
+
+# a word of three letters which the vertical words of one letter force to
+# 1, 2 and 1: every letter has one number, but the word repeats a number and
+# does not sum up to its clue
+BROKEN_WORD = ['E;V1-H;V2-H;V1-H', 'V-H13;L;L;L']
+# rules which do not check sums or repeated numbers of a whole word
+WEAK_RULES = ([Model.HIDDEN_SINGLES], [Model.HIDDEN_PAIRS],
+              [Model.CROSS_RUN_LIMITS], [Model.REQUIRED_NUMBERS])
+
+################################################################################
+
+def bruteForce(model, limit):
+    """
+    Returns up to limit solutions of the model, each as a dictionary of
+    numbers by letter indexes, found by trying all the numbers in every
+    letter and checking only the sums and repeated numbers of the words, with
+    none of the rules of the model.
+    """
+
+    letters = sorted({index for run in model.runs for index in run.indexes})
+    wordsOf = {index: [run for run in model.runs if index in run.indexes]
+               for index in letters}
+    numbers = {}
+    solutions = []
+
+    def isWordPossible(run):
+        assigned = [numbers[index] for index in run.indexes
+                    if index in numbers]
+        if len(set(assigned)) != len(assigned):
+            return False
+        # the letters left can add at least the smallest and at most the
+        # biggest unused numbers
+        unused = [number for number in range(1, 10)
+                  if number not in assigned]
+        left = len(run.indexes) - len(assigned)
+        return sum(assigned) + sum(unused[:left]) <= run.clue \
+            <= sum(assigned) + sum(unused[len(unused) - left:])
+
+    def possibleNumbers(index):
+        result = []
+
+        for number in range(1, 10):
+            numbers[index] = number
+            if all(isWordPossible(run) for run in wordsOf[index]):
+                result.append(number)
+        del numbers[index]
+        return result
+
+    def assign():
+        if len(solutions) >= limit:
+            return
+        unassigned = [index for index in letters if index not in numbers]
+        if len(unassigned) == 0:
+            solutions.append(dict(numbers))
+            return
+
+        # the letter with the least numbers left is tried first, so that a
+        # word which cannot be finished is found out early
+        index, possible = min(((index, possibleNumbers(index))
+                               for index in unassigned),
+                              key=lambda pair: len(pair[1]))
+        for number in possible:
+            numbers[index] = number
+            assign()
+        numbers.pop(index, None)
+
+    assign()
+    return solutions
+
+################################################################################
+
+def isSolution(model):
+    """
+    Returns True if every letter of the model has one number and every word
+    sums up to its clue with no number repeated, checked without the model.
+    """
+
+    for run in model.runs:
+        candidates = [model.candidates(*divmod(index, model.width))
+                      for index in run.indexes]
+        if any(len(numbers) != 1 for numbers in candidates):
+            return False
+        numbers = [numbers[0] for numbers in candidates]
+        if len(set(numbers)) != len(numbers) or sum(numbers) != run.clue:
+            return False
+
+    return True
+
+################################################################################
+
+def smallPuzzles():
+    """
+    Returns rows of small generated puzzles. The smallest ones come also with
+    their first clue changed: the horizontal clues then no longer sum up to
+    the same as the vertical ones, so there is no solution, but only a whole
+    search can tell.
+    """
+
+    puzzles = [BROKEN_WORD]
+
+    for size in (4, 5, 6):
+
+        for seed in range(6):
+            rows = generatePuzzle(size, size, 0.3, seed).split()
+            puzzles.append(rows)
+            if size > 4:
+                continue
+
+            model = Model.fromLines(rows)
+            run = model.runs[0]
+            i, j = run.cells[0]
+            i, j = (i, j - 1) if run.orientation == Model.HORIZONTAL \
+                else (i - 1, j)
+            tokens = rows[i].split(Model.TOKENS_DELIMITER)
+            clues = [run.orientation + str(run.clue + 1)
+                     if clue == run.orientation + str(run.clue) else clue
+                     for clue in tokens[j].split(Model.CLUES_DELIMITER)]
+            tokens[j] = Model.CLUES_DELIMITER.join(clues)
+            changed = list(rows)
+            changed[i] = Model.TOKENS_DELIMITER.join(tokens)
+            puzzles.append(changed)
+
+    return puzzles
+
+################################################################################
+
+class SearchTest(unittest.TestCase):
+
+################################################################################
+
+    @classmethod
+    def setUpClass(cls):
+        """
+        Solves the small puzzles by brute force once for all the tests.
+        """
+
+        cls.puzzles = [(rows, bruteForce(Model.fromLines(rows), 3))
+                       for rows in smallPuzzles()]
+
+################################################################################
+
+    def checkSolve(self, rows, solutions, rules=None, workers=1):
+        """
+        Solves the puzzle with search and checks the result against the
+        brute force: a valid solution if there is any, no solution otherwise.
+        """
+
+        model = Model.fromLines(rows)
+        if rules is not None:
+            model.rules = rules
+        result = model.solve(search=True, workers=workers)
+
+        if len(solutions) == 0:
+            self.assertEqual(result.status, Model.UNSOLVABLE, rows)
+            self.assertFalse(model.isSolved(), rows)
+        else:
+            self.assertEqual(result.status, Model.SOLVED, rows)
+            self.assertTrue(model.isSolved(), rows)
+            self.assertTrue(isSolution(model), rows)
+
+################################################################################
+
+    def testBrokenWordIsNotSolved(self):
+        model = Model.fromLines(BROKEN_WORD)
+        model.rules = [Model.HIDDEN_SINGLES]
+
+        self.assertEqual(model.solve(search=True).status, Model.UNSOLVABLE)
+        self.assertFalse(model.isSolved())
+        self.assertEqual(Model.fromLines(BROKEN_WORD).countSolutions(), 0)
+
+################################################################################
+
+    def testClueTooBig(self):
+        rows = ['E;V50-H', 'E;L', 'E;L']
+
+        self.assertEqual(Model.fromLines(rows).solve().status,
+                         Model.UNSOLVABLE)
+        self.assertEqual(Model.fromLines(rows).countSolutions(), 0)
+
+################################################################################
+
+    def testSearchMatchesBruteForce(self):
+        for rows, solutions in self.puzzles:
+            self.checkSolve(rows, solutions)
+
+################################################################################
+
+    def testSearchWithWeakRules(self):
+        for rules in WEAK_RULES:
+
+            for rows, solutions in self.puzzles:
+                self.checkSolve(rows, solutions, rules)
+
+################################################################################
+
+    def testCountSolutions(self):
+        for rows, solutions in self.puzzles:
+            model = Model.fromLines(rows)
+
+            self.assertEqual(model.countSolutions(3), len(solutions), rows)
+            if len(solutions) > 0:
+                self.assertTrue(isSolution(model), rows)
+
+################################################################################
+
+    def testCountSolutionsWithWeakRules(self):
+        for rules in WEAK_RULES:
+
+            for rows, solutions in self.puzzles:
+                model = Model.fromLines(rows)
+                model.rules = rules
+
+                self.assertEqual(model.countSolutions(3), len(solutions),
+                                 (rules, rows))
+
+################################################################################
+
+    def testParallelSearch(self):
+        for rows, solutions in self.puzzles[:8]:
+            self.checkSolve(rows, solutions, workers=2)
+
+            model = Model.fromLines(rows)
+            self.assertEqual(model.countSolutions(3, workers=2),
+                             len(solutions), rows)
+
+################################################################################
+
+if __name__ == '__main__':
+    unittest.main()
+
+################################################################################
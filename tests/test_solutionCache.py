@@ -0,0 +1,68 @@
+__author__ = "Tofu Gang"
+
+import unittest
+from benchmarks.generator import generatePuzzle
+from src.model import Model
+from src.solutionCache import SolutionCache, fingerprint
+from tests.test_search import BROKEN_WORD
+
+
+
+################################################################################
+
+class SolutionCacheTest(unittest.TestCase):
+
+################################################################################
+
+    def setUp(self):
+        self.rows = generatePuzzle(6, 6, 0.3, 1).split()
+        self.cache = SolutionCache()
+
+################################################################################
+
+    def testFingerprintOfPartlySolvedPuzzle(self):
+        model = Model.fromLines(self.rows)
+        key = fingerprint(model)
+        model.rawHeuristic()
+        model.contextSolutionsHeuristic()
+
+        self.assertEqual(fingerprint(model), key)
+        self.assertNotEqual(fingerprint(Model.fromLines(BROKEN_WORD)), key)
+
+################################################################################
+
+    def testSolutionIsTakenFromCache(self):
+        model = Model.fromLines(self.rows)
+        self.assertFalse(self.cache.solve(model, search=True))
+        self.assertTrue(model.isSolved())
+
+        model = Model.fromLines(self.rows)
+        model.rawHeuristic()
+        self.assertTrue(self.cache.solve(model, search=True))
+        self.assertTrue(model.isSolved())
+
+################################################################################
+
+    def testBrokenGridIsNotStored(self):
+        model = Model.fromLines(BROKEN_WORD)
+        model.rules = [Model.HIDDEN_SINGLES]
+
+        self.assertFalse(self.cache.solve(model, search=True))
+        self.assertEqual(self.cache.statistics()['stores'], 0)
+
+################################################################################
+
+    def testBrokenGridIsNotTakenFromCache(self):
+        rows = ['E;V1-H;V2-H;V1-H', 'V-H13;1;2;1']
+        model = Model.fromLines(BROKEN_WORD)
+        self.cache.put(fingerprint(model), rows)
+
+        self.assertFalse(self.cache.solve(model, search=True))
+        self.assertFalse(model.isSolved())
+
+################################################################################
+
+if __name__ == '__main__':
+    unittest.main()
+
+################################################################################
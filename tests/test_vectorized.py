@@ -0,0 +1,42 @@
+__author__ = "Tofu Gang"
+
+import unittest
+from src.model import Model
+
+try:
+    from src.vectorized import BatchPropagator
+except ImportError:
+    BatchPropagator = None
+
+
+
+################################################################################
+
+@unittest.skipIf(BatchPropagator is None, 'NumPy is not installed')
+class VectorizedTest(unittest.TestCase):
+
+################################################################################
+
+    def testLettersOfVerticalWordsOnly(self):
+        propagator = BatchPropagator([Model.fromLines(['E;V3-H', 'E;L',
+                                                       'E;L'])])
+
+        self.assertFalse(propagator.isSolved()[0])
+        propagator.domains[0, 3] = 0
+        self.assertTrue(propagator.isFailed()[0])
+
+################################################################################
+
+    def testClueTooBig(self):
+        propagator = BatchPropagator([Model.fromLines(['E;V50-H', 'E;L',
+                                                       'E;L'])])
+        propagator.propagate()
+
+        self.assertTrue(propagator.isFailed()[0])
+
+################################################################################
+
+if __name__ == '__main__':
+    unittest.main()
+
+################################################################################